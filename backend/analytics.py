@@ -0,0 +1,192 @@
+"""Sales rollups: revenue, order count and units per day and dimension.
+
+create_order and update_order_status keep the `sales_rollups` collection up to
+date incrementally; the admin analytics endpoint only ever reads rollups, so
+its cost depends on the date range, not on order history. To recompute
+everything from db.orders (e.g. after a backfill), from backend/:
+
+    python analytics.py --rebuild
+"""
+import argparse
+import asyncio
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+from indexes import INDEXES
+
+ROLLUPS = "sales_rollups"
+DIMENSIONS = ("all", "category", "payment_method", "order_status")
+
+
+def rollup_day(created_at) -> datetime:
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    created_at = created_at.astimezone(timezone.utc)
+    return datetime(created_at.year, created_at.month, created_at.day, tzinfo=timezone.utc)
+
+
+def _rollup_update(day: datetime, dimension: str, value, revenue, orders, units):
+    value = "unknown" if value is None else str(value)
+    return UpdateOne(
+        {"_id": f"{day.strftime('%Y-%m-%d')}|{dimension}|{value}"},
+        {
+            "$inc": {"revenue": round(revenue, 2), "orders": orders, "units": units},
+            "$setOnInsert": {"day": day, "dimension": dimension, "value": value},
+        },
+        upsert=True,
+    )
+
+
+def order_rollup_updates(order: dict, sign: int = 1, dimensions=DIMENSIONS) -> list:
+    day = rollup_day(order['created_at'])
+    items = order.get('items', [])
+    units = sum(item.get('quantity', 1) for item in items)
+    revenue = order.get('total_amount', 0)
+    updates = []
+    for dimension in dimensions:
+        if dimension == "all":
+            updates.append(_rollup_update(day, "all", "all", sign * revenue, sign, sign * units))
+        elif dimension == "category":
+            by_category = defaultdict(lambda: [0.0, 0])
+            for item in items:
+                quantity = item.get('quantity', 1)
+                by_category[item.get('category')][0] += (item.get('price') or 0) * quantity
+                by_category[item.get('category')][1] += quantity
+            for category, (category_revenue, category_units) in by_category.items():
+                updates.append(_rollup_update(day, "category", category, sign * category_revenue, sign, sign * category_units))
+        else:
+            updates.append(_rollup_update(day, dimension, order.get(dimension), sign * revenue, sign, sign * units))
+    return updates
+
+
+async def record_order(db, order: dict, session=None):
+    await db[ROLLUPS].bulk_write(order_rollup_updates(order), ordered=False, session=session)
+
+
+async def record_status_change(db, order: dict, old_status: str, new_status: str, session=None):
+    # Move the order from its old status bucket to the new one
+    updates = order_rollup_updates({**order, "order_status": old_status}, sign=-1, dimensions=("order_status",))
+    updates += order_rollup_updates({**order, "order_status": new_status}, dimensions=("order_status",))
+    await db[ROLLUPS].bulk_write(updates, ordered=False, session=session)
+
+
+async def query_rollups(db, dimension: str, start: datetime = None, end: datetime = None):
+    query = {"dimension": dimension}
+    if start or end:
+        query['day'] = {}
+        if start:
+            query['day']['$gte'] = rollup_day(start)
+        if end:
+            query['day']['$lt'] = end
+    series = await db[ROLLUPS].find(query, {"_id": 0}).sort([("day", 1), ("value", 1)]).to_list(None)
+    totals = defaultdict(lambda: {"revenue": 0.0, "orders": 0, "units": 0})
+    for row in series:
+        row['revenue'] = round(row['revenue'], 2)
+        total = totals[row['value']]
+        total['revenue'] = round(total['revenue'] + row['revenue'], 2)
+        total['orders'] += row['orders']
+        total['units'] += row['units']
+    return {"dimension": dimension, "series": series, "totals": dict(totals)}
+
+
+def _rollup_projection(dimension: str):
+    return {
+        "_id": {"$concat": [
+            {"$dateToString": {"format": "%Y-%m-%d", "date": "$_id.day"}},
+            f"|{dimension}|",
+            {"$ifNull": [{"$toString": "$_id.value"}, "unknown"]},
+        ]},
+        "day": "$_id.day",
+        "dimension": dimension,
+        "value": {"$ifNull": [{"$toString": "$_id.value"}, "unknown"]},
+        "revenue": {"$round": ["$revenue", 2]},
+        "orders": 1,
+        "units": 1,
+    }
+
+
+ORDER_DAY = {"$dateFromString": {"dateString": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$created_at"}}}}}
+
+
+def rebuild_pipelines(target: str) -> list:
+    pipelines = []
+    for dimension in ("all", "payment_method", "order_status"):
+        pipelines.append([
+            {"$group": {
+                "_id": {"day": ORDER_DAY, "value": "all" if dimension == "all" else f"${dimension}"},
+                "revenue": {"$sum": "$total_amount"},
+                "orders": {"$sum": 1},
+                "units": {"$sum": {"$sum": "$items.quantity"}},
+            }},
+            {"$project": _rollup_projection(dimension)},
+            {"$merge": {"into": target, "whenMatched": "replace"}},
+        ])
+    # Category revenue is the sum of its lines; orders written before items
+    # carried a category fall back to the product's current category.
+    pipelines.append([
+        {"$unwind": "$items"},
+        {"$lookup": {"from": "products", "localField": "items.product_id", "foreignField": "id", "as": "product"}},
+        {"$group": {
+            "_id": {
+                "order": "$id",
+                "day": ORDER_DAY,
+                "value": {"$ifNull": ["$items.category", {"$arrayElemAt": ["$product.category", 0]}]},
+            },
+            "revenue": {"$sum": {"$multiply": [{"$ifNull": ["$items.price", 0]}, {"$ifNull": ["$items.quantity", 1]}]}},
+            "units": {"$sum": {"$ifNull": ["$items.quantity", 1]}},
+        }},
+        {"$group": {
+            "_id": {"day": "$_id.day", "value": "$_id.value"},
+            "revenue": {"$sum": "$revenue"},
+            "orders": {"$sum": 1},
+            "units": {"$sum": "$units"},
+        }},
+        {"$project": _rollup_projection("category")},
+        {"$merge": {"into": target, "whenMatched": "replace"}},
+    ])
+    return pipelines
+
+
+async def rebuild_rollups(db):
+    # Build into a scratch collection and swap it in, so readers never see a
+    # half-built set of rollups.
+    target = f"{ROLLUPS}_rebuild"
+    await db[target].drop()
+    for pipeline in rebuild_pipelines(target):
+        await db.orders.aggregate(pipeline, allowDiskUse=True).to_list(None)
+    if await db[target].estimated_document_count() == 0:
+        await db[ROLLUPS].delete_many({})
+        return 0
+    # Built before the swap so the live collection is never without its indexes
+    await db[target].create_indexes(INDEXES[ROLLUPS])
+    await db[target].rename(ROLLUPS, dropTarget=True)
+    return await db[ROLLUPS].estimated_document_count()
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.rebuild:
+            count = await rebuild_rollups(db)
+            print(f"Rebuilt {count} rollup documents from orders")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from db.orders")
+    sys.exit(asyncio.run(main(parser.parse_args())))
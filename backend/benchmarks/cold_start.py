@@ -0,0 +1,95 @@
+"""Time from process start to serving, with and without the startup warm-up.
+
+Starts `run_server.py` as a subprocess against the database configured in
+backend/.env (or --mongo-url), polls the health probes, then times the first
+and second GET /api/products. Repeats for STARTUP_WARMUP=true and false and
+prints a JSON report. From backend/:
+
+    python -m benchmarks.cold_start --repeat 5
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.stats import summarize
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client, path: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{path} did not answer 200 in time")
+
+
+def timed_get(client, path: str) -> float:
+    started = time.perf_counter()
+    client.get(path).raise_for_status()
+    return time.perf_counter() - started
+
+
+def start_once(args, warm: bool) -> dict:
+    port = free_port()
+    env = {**os.environ, "STARTUP_WARMUP": "true" if warm else "false"}
+    if args.mongo_url:
+        env["MONGO_URL"] = args.mongo_url
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "run_server.py", "--workers", "1", "--port", str(port),
+         "--host", "127.0.0.1", "--log-level", "warning", "--drain-seconds", "0"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout) as client:
+            deadline = started + args.timeout
+            live = wait_for(client, "/api/health/live", deadline)
+            ready = wait_for(client, "/api/health/ready", deadline)
+            first = timed_get(client, "/api/products")
+            second = timed_get(client, "/api/products")
+    finally:
+        process.terminate()
+        process.wait()
+    return {"live": live - started, "ready": ready - started, "first_request": first, "second_request": second}
+
+
+def report(runs):
+    # summarize() reports in milliseconds
+    return {field: summarize([run[field] for run in runs]) for field in runs[0]}
+
+
+def main(args):
+    result = {"repeat": args.repeat}
+    for warm in (True, False):
+        runs = [start_once(args, warm) for _ in range(args.repeat)]
+        result["warm" if warm else "cold"] = report(runs)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold start with and without STARTUP_WARMUP")
+    parser.add_argument("--mongo-url", help="defaults to MONGO_URL from backend/.env")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="also write the JSON report here")
+    main(parser.parse_args())
@@ -0,0 +1,387 @@
+"""Reproducible load test for the API.
+
+Starts the FastAPI app from server.py in-process (through its lifespan, so
+indexes and warm-up run as in production) against either a local mongod or an
+in-memory stand-in, seeds a realistic catalog, users, carts and orders, then
+drives a weighted mix of shopper and admin flows from concurrent virtual users
+and reports per-route throughput and p50/p95/p99 as JSON. From backend/:
+
+    # in-memory stand-in (pip install mongomock-motor); good for relative numbers
+    python -m benchmarks.load_test --backend memory --output bench.json
+
+    # local mongod; a throwaway database is created and dropped
+    python -m benchmarks.load_test --mongo-url mongodb://localhost:27017 --output bench.json
+
+    # fail (exit 1) if any route regressed more than 15% against a saved run
+    python -m benchmarks.load_test --backend memory --compare bench-baseline.json
+
+Runs are seeded (--seed), so two runs issue the same request sequence per
+virtual user modulo scheduling.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from benchmarks.stats import summarize
+
+BENCH_PASSWORD = "bench-password"
+
+CATEGORIES = {
+    "skincare": ["Serum", "Cream", "Face Wash", "Toner", "Sunscreen", "Face Mask"],
+    "haircare": ["Shampoo", "Conditioner", "Hair Oil", "Hair Serum", "Hair Mask"],
+    "bodycare": ["Body Lotion", "Body Butter", "Body Scrub", "Body Wash", "Bath Salts"],
+}
+CONCERNS = ["acne", "aging", "dark_spots", "dry_skin", "dull_skin", "hair_fall", "dandruff", "frizzy_hair", "damaged_hair", "stress"]
+INGREDIENTS = ["Vitamin C", "Hyaluronic Acid", "Niacinamide", "Tea Tree Oil", "Retinol", "Biotin", "Argan Oil",
+               "Shea Butter", "Coconut Oil", "Aloe Vera", "Salicylic Acid", "Ceramides", "Green Tea", "Rose Water"]
+ADJECTIVES = ["Brightening", "Hydrating", "Soothing", "Repairing", "Clarifying", "Nourishing", "Firming", "Calming"]
+SEARCH_TERMS = ["serum", "vitamin c", "tea tree", "hydrating cream", "shampoo", "argan oil", "retinol night",
+                "body butter", "acne", "rose water toner", "hair fall", "niacinamide"]
+PRODUCT_SORTS = [None, "effective_price", "-effective_price", "-rating", "-review_count", "-created_at"]
+
+# Flow name -> relative weight in the traffic mix
+FLOW_WEIGHTS = {
+    "browse": 35,
+    "search": 15,
+    "product_detail": 20,
+    "cart_add": 12,
+    "login": 4,
+    "checkout": 6,
+    "admin_orders": 8,
+}
+
+
+def make_product(rng: random.Random, index: int, now: datetime) -> dict:
+    category = rng.choice(list(CATEGORIES))
+    kind = rng.choice(CATEGORIES[category])
+    ingredients = rng.sample(INGREDIENTS, 3)
+    price = rng.randrange(199, 2499, 50)
+    product = {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "name": f"{rng.choice(ADJECTIVES)} {ingredients[0]} {kind} {index}",
+        "description": f"A {kind.lower()} with {', '.join(ingredients).lower()} for everyday use. " * 3,
+        "price": float(price),
+        "offer_price": float(price - rng.randrange(0, price // 3, 10)) if rng.random() < 0.7 else None,
+        "category": category,
+        "concern": rng.choice(CONCERNS),
+        "images": [f"https://images.example.com/products/{index}.jpg"],
+        "rating": round(rng.uniform(3.5, 5.0), 1),
+        "review_count": rng.randrange(0, 2000),
+        "ingredients": ", ".join(ingredients),
+        "how_to_use": "Apply on clean skin and massage gently. Use twice daily.",
+        "in_stock": rng.random() < 0.95,
+        # Most products track stock, deep enough that checkouts rarely sell out
+        "stock": rng.randrange(1000, 5000) if rng.random() < 0.8 else None,
+        "created_at": now - timedelta(days=rng.randrange(0, 365), seconds=index),
+    }
+    product["effective_price"] = product["offer_price"] if product["offer_price"] is not None else product["price"]
+    return product
+
+
+async def insert_chunked(collection, docs, chunk_size: int = 5000):
+    for start in range(0, len(docs), chunk_size):
+        await collection.insert_many(docs[start:start + chunk_size], ordered=False)
+
+
+async def seed(server, rng: random.Random, args):
+    db = server.db
+    now = datetime.now(timezone.utc)
+    products = [make_product(rng, i, now) for i in range(args.products)]
+    await insert_chunked(db.products, [dict(product) for product in products])
+
+    # Hash once: every seeded user shares the password, and seeding should not
+    # spend minutes in bcrypt.
+    password_hash = await server.password_hasher.hash(BENCH_PASSWORD)
+    users = [{
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "email": f"bench-user-{i}@example.com",
+        "name": f"Bench User {i}",
+        "phone": None,
+        "password": password_hash,
+        "created_at": now - timedelta(days=rng.randrange(0, 365)),
+    } for i in range(args.users)]
+    await insert_chunked(db.users, users)
+
+    carts = [{
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "user_id": user["id"],
+        "items": [{"product_id": product["id"], "quantity": rng.randint(1, 3)} for product in rng.sample(products, rng.randint(1, 4))],
+        "updated_at": now,
+    } for user in users if rng.random() < 0.4]
+    await insert_chunked(db.carts, carts)
+
+    statuses = ["placed", "processing", "shipped", "delivered", "cancelled"]
+    orders = []
+    for i in range(args.orders):
+        lines = rng.sample(products, rng.randint(1, 4))
+        items = [{
+            "product_id": product["id"],
+            "product_name": product["name"],
+            "category": product["category"],
+            "quantity": rng.randint(1, 3),
+            "price": product["offer_price"] or product["price"],
+        } for product in lines]
+        orders.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": rng.choice(users)["id"],
+            "items": items,
+            "total_amount": round(sum(item["price"] * item["quantity"] for item in items), 2),
+            "address": {"name": "Bench", "city": "Mumbai", "pincode": "400001"},
+            "payment_method": rng.choice(["online", "cod"]),
+            "payment_status": "success",
+            "order_status": rng.choice(statuses),
+            "created_at": now - timedelta(minutes=rng.randrange(0, 60 * 24 * 180)),
+        })
+    await insert_chunked(db.orders, orders)
+    await server.bump_catalog_version()
+    return products, users
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.recording = False
+
+    async def request(self, client, route: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, "transport_error"
+        if self.recording:
+            self.samples[route].append(time.perf_counter() - started)
+            self.statuses[route][status] += 1
+        return response
+
+
+class Flows:
+    def __init__(self, recorder: Recorder, products: list, users: list):
+        self.recorder = recorder
+        self.products = products
+        self.users = users
+
+    async def browse(self, client, rng, headers):
+        params = {"limit": 24}
+        if rng.random() < 0.6:
+            params["category"] = rng.choice(list(CATEGORIES))
+        sort = rng.choice(PRODUCT_SORTS)
+        if sort:
+            params["sort"] = sort
+        response = await self.recorder.request(client, "GET /api/products", "GET", "/api/products", params=params)
+        next_cursor = response is not None and response.headers.get("x-next-cursor")
+        if next_cursor and rng.random() < 0.3:
+            await self.recorder.request(client, "GET /api/products", "GET", "/api/products",
+                                        params={**params, "cursor": next_cursor})
+
+    async def search(self, client, rng, headers):
+        await self.recorder.request(client, "GET /api/products?search", "GET", "/api/products",
+                                    params={"search": rng.choice(SEARCH_TERMS), "limit": 24})
+
+    async def product_detail(self, client, rng, headers):
+        product = rng.choice(self.products)
+        await self.recorder.request(client, "GET /api/products/{id}", "GET", f"/api/products/{product['id']}")
+
+    async def cart_add(self, client, rng, headers):
+        product = rng.choice(self.products)
+        await self.recorder.request(client, "POST /api/cart", "POST", "/api/cart", headers=headers,
+                                    json={"product_id": product["id"], "quantity": rng.randint(1, 2)})
+
+    async def login(self, client, rng, headers):
+        user = rng.choice(self.users)
+        await self.recorder.request(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                    json={"email": user["email"], "password": BENCH_PASSWORD})
+
+    async def checkout(self, client, rng, headers):
+        # The server prices the order; about one checkout in ten is retried
+        # with the same Idempotency-Key and must not place a second order.
+        lines = rng.sample([product for product in self.products if product["in_stock"]], rng.randint(1, 3))
+        body = {
+            "items": [{"product_id": product["id"], "quantity": rng.randint(1, 2)} for product in lines],
+            "address": {"name": "Bench", "city": "Mumbai", "pincode": "400001"},
+            "payment_method": rng.choice(["online", "cod"]),
+        }
+        headers = {**headers, "Idempotency-Key": str(uuid.UUID(int=rng.getrandbits(128)))}
+        for _ in range(2 if rng.random() < 0.1 else 1):
+            await self.recorder.request(client, "POST /api/orders", "POST", "/api/orders", headers=headers, json=body)
+
+    async def admin_orders(self, client, rng, headers):
+        params = {"limit": 50}
+        if rng.random() < 0.3:
+            params["sort"] = "-total_amount"
+        await self.recorder.request(client, "GET /api/admin/orders", "GET", "/api/admin/orders", params=params)
+
+
+async def virtual_user(client, flows: Flows, token: str, seed: int, stop: asyncio.Event):
+    rng = random.Random(seed)
+    headers = {"Authorization": f"Bearer {token}"}
+    names = list(FLOW_WEIGHTS)
+    weights = list(FLOW_WEIGHTS.values())
+    while not stop.is_set():
+        flow = rng.choices(names, weights)[0]
+        await getattr(flows, flow)(client, rng, headers)
+
+
+def connect_backend(args):
+    # Configure before server is imported: it reads its settings at import time
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = args.db_name
+    # Every virtual user shares one client address and a handful of emails
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.backend == "memory":
+        # The in-memory stand-in has no multi-document transactions
+        os.environ["CHECKOUT_TRANSACTIONS"] = "false"
+    import server
+
+    if args.backend == "memory":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--backend memory needs the optional mongomock-motor package: pip install mongomock-motor")
+        # The lifespan only connects when no client is set yet
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db_name]
+    return server
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    server = connect_backend(args)
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=server.app)
+    recorder = Recorder()
+
+    async with server.app.router.lifespan_context(server.app):
+        if args.backend == "memory":
+            # The stand-in ignores partialFilterExpression, which would make
+            # every order without an Idempotency-Key collide on this index
+            await server.db.orders.drop_index("orders_user_id_idempotency_key_unique")
+        seed_started = time.perf_counter()
+        products, users = await seed(server, rng, args)
+        seed_seconds = time.perf_counter() - seed_started
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            tokens = []
+            for user in users[:args.concurrency]:
+                response = await client.post("/api/auth/login", json={"email": user["email"], "password": BENCH_PASSWORD})
+                response.raise_for_status()
+                tokens.append(response.json()["token"])
+
+            flows = Flows(recorder, products, users)
+            stop = asyncio.Event()
+            tasks = [
+                asyncio.create_task(virtual_user(client, flows, tokens[i % len(tokens)], args.seed + i, stop))
+                for i in range(args.concurrency)
+            ]
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            recorder.recording = False
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await asyncio.gather(*tasks)
+
+        if args.backend != "memory" and not args.keep_db:
+            await server.client.drop_database(args.db_name)
+
+    routes = {}
+    for route, samples in sorted(recorder.samples.items()):
+        statuses = recorder.statuses[route]
+        errors = sum(count for status, count in statuses.items() if status == "transport_error" or status >= 400)
+        routes[route] = {
+            **summarize(samples, elapsed),
+            "errors": errors,
+            "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        }
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+        },
+        "config": {
+            "products": args.products, "users": args.users, "orders": args.orders,
+            "concurrency": args.concurrency, "duration": args.duration, "warmup": args.warmup,
+            "seed": args.seed, "flow_weights": FLOW_WEIGHTS,
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "total": summarize(all_samples, elapsed),
+        "routes": routes,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + max_regression):
+                regressions.append(f"{route}: {metric} {previous[metric]} -> {current[metric]}")
+        if previous.get("throughput_rps") and current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{route}: throughput_rps {previous['throughput_rps']} -> {current['throughput_rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["mongod", "memory"], default="mongod")
+    parser.add_argument("--mongo-url", help="default: MONGO_URL from the environment / backend/.env")
+    parser.add_argument("--db-name", default=f"bench_{int(time.time())}")
+    parser.add_argument("--keep-db", action="store_true", help="do not drop the benchmark database afterwards")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before recording")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="allowed relative slowdown per route")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure GET /api/products latency while a burst of logins runs bcrypt.
+
+Runs the app in-process against the database configured in backend/.env and
+prints a JSON report. Compare the pooled executor with the old blocking
+behaviour by running it twice from backend/:
+
+    python -m benchmarks.login_storm
+    PASSWORD_HASH_EXECUTOR=inline python -m benchmarks.login_storm
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import httpx
+
+# The storm is one client logging in as one user over and over
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import server
+from benchmarks.stats import summarize
+
+
+async def probe_products(client, stop: asyncio.Event, samples: list, interval: float):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/products")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def login_worker(client, credentials: dict, remaining: list, latencies: list):
+    while remaining:
+        remaining.pop()
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", json=credentials)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args):
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/api/init-products")
+        credentials = {"email": f"bench-{uuid.uuid4().hex[:12]}@example.com", "password": "bench-password"}
+        response = await client.post("/api/auth/register", json={**credentials, "name": "Benchmark"})
+        response.raise_for_status()
+
+        # Baseline: products alone
+        stop = asyncio.Event()
+        baseline = []
+        probe = asyncio.create_task(probe_products(client, stop, baseline, args.probe_interval))
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        await probe
+
+        # Storm: the same probe while `concurrency` clients log in back to back
+        stop = asyncio.Event()
+        during_storm = []
+        login_latencies = []
+        remaining = list(range(args.logins))
+        probe = asyncio.create_task(probe_products(client, stop, during_storm, args.probe_interval))
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            login_worker(client, credentials, remaining, login_latencies)
+            for _ in range(args.concurrency)
+        ))
+        storm_seconds = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    return {
+        "executor": server.password_hasher.executor_kind,
+        "hash_workers": server.password_hasher.workers,
+        "logins": args.logins,
+        "login_concurrency": args.concurrency,
+        "logins_per_second": round(args.logins / storm_seconds, 2),
+        "login": summarize(login_latencies),
+        "products_baseline": summarize(baseline),
+        "products_during_storm": summarize(during_storm),
+        "password_hashing": server.password_hasher.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    parser.add_argument("--probe-interval", type=float, default=0.005)
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
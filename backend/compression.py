@@ -0,0 +1,176 @@
+"""Response compression negotiated from Accept-Encoding.
+
+CompressionMiddleware compresses text-like responses of at least
+`minimum_size` bytes with brotli (when the optional `brotli` package is
+installed) or gzip, streaming responses chunk by chunk. Responses that already
+carry a Content-Encoding pass through untouched: catalog routes serve
+`Payload` bodies whose compressed variants are built once and cached with the
+payload, i.e. per catalog version.
+"""
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+# Dynamic responses favour speed; cached payloads are compressed once, so
+# spend more CPU on a smaller body.
+DYNAMIC_LEVELS = {"br": 4, "gzip": 6}
+STATIC_LEVELS = {"br": 9, "gzip": 9}
+
+
+def choose_encoding(accept_encoding: str):
+    """Best supported encoding the client accepts (q > 0), preferring brotli."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, levels=DYNAMIC_LEVELS) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=levels["br"])
+    return gzip.compress(body, compresslevel=levels["gzip"], mtime=0)
+
+
+class Payload:
+    """Pre-encoded response body that memoizes its compressed variants."""
+
+    __slots__ = ("body", "_variants")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._variants = {}
+
+    def __len__(self):
+        return len(self.body)
+
+    def encoded(self, encoding: str) -> bytes:
+        variant = self._variants.get(encoding)
+        if variant is None:
+            variant = self._variants[encoding] = compress(self.body, encoding, STATIC_LEVELS)
+        return variant
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    # Each content-coding is a representation of its own, with its own strong
+    # tag: "abc" becomes "abc-gzip"
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def split_etag(etag: str):
+    """(tag without W/ and encoding suffix, encoding or None) of an entity tag."""
+    etag = etag.strip().removeprefix("W/")
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"', encoding
+    return etag, None
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=DYNAMIC_LEVELS["br"])
+        else:
+            self._compressor = zlib.compressobj(DYNAMIC_LEVELS["gzip"], zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flush per chunk so streamed exports stay incremental for the client
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                headers = {name.lower(): value for name, value in start["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(start)
+                    return
+                # Shared caches must key compressible responses on Accept-Encoding
+                start["headers"] = [*start["headers"], (b"vary", b"Accept-Encoding")]
+                if encoding is None:
+                    passthrough = True
+                    await send(start)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers = [(name, value) for name, value in start["headers"] if name.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers = [
+                    (name, encoded_etag(value.decode("latin-1"), encoding).encode("latin-1") if name.lower() == b"etag" else value)
+                    for name, value in headers
+                ]
+                if not more_body:
+                    body = compress(body, encoding)
+                    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    passthrough = True
+                    return
+                compressor = _StreamCompressor(encoding)
+                await send({**start, "headers": headers})
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,204 @@
+"""Declarative index registry and query-plan check for every collection.
+
+The app applies the registry idempotently at startup. From backend/:
+
+    python indexes.py            # create missing indexes
+    python indexes.py --check    # create, then explain() every route query shape
+                                 # and exit non-zero if any of them is a COLLSCAN
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from search_index import FIELD_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_SORT_FIELDS = {"price", "offer_price", "effective_price", "rating", "review_count", "created_at"}
+ORDER_SORT_FIELDS = {"created_at", "total_amount"}
+
+
+def _unique_id(collection: str) -> IndexModel:
+    return IndexModel([("id", ASCENDING)], unique=True, name=f"{collection}_id_unique")
+
+
+def _keyset(collection: str, *fields) -> IndexModel:
+    # Keyset pagination: (optional filter fields..., sort field, id)
+    keys = [*fields, "id"]
+    return IndexModel([(key, ASCENDING) for key in keys], name=f"{collection}_{'_'.join(keys)}")
+
+
+INDEXES = {
+    "users": [
+        _unique_id("users"),
+        IndexModel([("email", ASCENDING)], unique=True, name="users_email_unique"),
+    ],
+    "products": [
+        _unique_id("products"),
+        IndexModel(
+            [(field, TEXT) for field in FIELD_WEIGHTS],
+            weights={field: int(weight * 2) for field, weight in FIELD_WEIGHTS.items()},
+            name="products_text_search",
+        ),
+        *[
+            _keyset("products", *prefix, field)
+            for field in sorted(PRODUCT_SORT_FIELDS)
+            for prefix in ((), ("category",), ("concern",))
+        ],
+        # Reaping abandoned checkout reservations
+        IndexModel([("reservations.at", ASCENDING)], sparse=True, name="products_reservations_at"),
+    ],
+    "carts": [
+        _unique_id("carts"),
+        IndexModel([("user_id", ASCENDING)], unique=True, name="carts_user_id_unique"),
+    ],
+    "wishlists": [
+        _unique_id("wishlists"),
+        IndexModel([("user_id", ASCENDING)], unique=True, name="wishlists_user_id_unique"),
+    ],
+    "addresses": [
+        _unique_id("addresses"),
+        IndexModel([("user_id", ASCENDING)], name="addresses_user_id"),
+    ],
+    "orders": [
+        _unique_id("orders"),
+        _keyset("orders", "user_id", "created_at"),
+        IndexModel(
+            [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}},
+            name="orders_user_id_idempotency_key_unique",
+        ),
+        *[_keyset("orders", field) for field in sorted(ORDER_SORT_FIELDS)],
+    ],
+    "outbox": [
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="outbox_status_run_at"),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="outbox_status_locked_until"),
+        # Completed jobs are kept for a week for inspection
+        IndexModel([("completed_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600, name="outbox_completed_at_ttl"),
+    ],
+    "product_pairs": [
+        IndexModel([("product_id", ASCENDING), ("count", DESCENDING), ("other", ASCENDING)], name="product_pairs_product_id_count_other"),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="rate_limits_expires_at_ttl"),
+    ],
+    "sales_rollups": [
+        IndexModel([("dimension", ASCENDING), ("day", ASCENDING), ("value", ASCENDING)], name="sales_rollups_dimension_day_value"),
+    ],
+}
+
+
+def _product_listing_shapes():
+    for field in sorted(PRODUCT_SORT_FIELDS):
+        for direction in (ASCENDING, DESCENDING):
+            sort = {field: direction, "id": direction}
+            yield "products", {}, sort
+            yield "products", {"category": "skincare"}, sort
+            yield "products", {"concern": "acne"}, sort
+            yield "products", {"category": "skincare", "concern": "acne"}, sort
+
+
+# Every (collection, filter, sort) the routes issue, with placeholder values
+QUERY_SHAPES = [
+    ("users", {"email": "user@example.com"}, None),
+    ("users", {"id": "x"}, None),
+    ("products", {"id": "x"}, None),
+    ("products", {"id": {"$in": ["x", "y"]}}, None),
+    ("products", {"$text": {"$search": "serum"}}, None),
+    ("products", {"reservations.at": {"$lt": datetime(2025, 1, 1)}}, None),
+    *_product_listing_shapes(),
+    ("carts", {"user_id": "x"}, None),
+    ("wishlists", {"user_id": "x"}, None),
+    ("addresses", {"user_id": "x"}, None),
+    ("addresses", {"id": "x", "user_id": "x"}, None),
+    ("orders", {"id": "x"}, None),
+    ("orders", {"user_id": "x", "idempotency_key": "x"}, None),
+    ("orders", {"user_id": "x"}, {"created_at": DESCENDING, "id": DESCENDING}),
+    *[
+        ("orders", {}, {field: direction, "id": direction})
+        for field in sorted(ORDER_SORT_FIELDS)
+        for direction in (ASCENDING, DESCENDING)
+    ],
+    ("sales_rollups", {"dimension": "all", "day": {"$gte": datetime(2025, 1, 1)}}, {"day": ASCENDING, "value": ASCENDING}),
+    ("product_pairs", {"product_id": "x"}, {"count": DESCENDING, "other": ASCENDING}),
+    ("outbox", {"status": "pending", "run_at": {"$lte": datetime(2025, 1, 1)}}, {"run_at": ASCENDING}),
+    ("outbox", {"status": "running", "locked_until": {"$lt": datetime(2025, 1, 1)}}, None),
+]
+
+
+async def ensure_indexes(db, strict: bool = False):
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # Usually existing duplicates blocking a unique index, or an index
+            # of the same name with different options
+            if strict:
+                raise
+            logger.error("Could not create indexes on %s: %s", collection, e)
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+async def explain_query_shapes(db):
+    results = []
+    for collection, query, sort in QUERY_SHAPES:
+        command = {"find": collection, "filter": query, "limit": 1}
+        if sort:
+            command["sort"] = sort
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        results.append({
+            "collection": collection,
+            "filter": query,
+            "sort": sort,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db, strict=True)
+        print(f"Indexes ensured on {len(INDEXES)} collections")
+        if not args.check:
+            return 0
+        results = await explain_query_shapes(db)
+        failures = [result for result in results if result["collscan"]]
+        for result in results:
+            print(f"{'COLLSCAN' if result['collscan'] else 'ok':8} {result['collection']:10} "
+                  f"filter={result['filter']} sort={result['sort']} plan={'>'.join(result['stages'])}")
+        print(f"{len(results)} query shapes checked, {len(failures)} collection scans")
+        return 1 if failures else 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="explain every query shape and fail on COLLSCAN")
+    sys.exit(asyncio.run(main(parser.parse_args())))
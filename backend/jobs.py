@@ -0,0 +1,260 @@
+"""In-process background jobs backed by a durable outbox collection.
+
+A job is a document in `outbox` naming a registered handler and its payload.
+Enqueuing inserts the document (optionally inside the caller's transaction,
+so a job exists if and only if the write that caused it committed) and wakes
+a local worker. Workers claim a job with an atomic pending -> running update
+carrying a lease, so several server processes can share one outbox; a poller
+picks up jobs that are due for retry, were enqueued by another process, or
+whose lease expired because the process running them died.
+
+Delivery is at least once. With `transactions=True` a handler's writes and
+the job's "done" update commit in one transaction (handlers are called as
+`handler(db, payload, session=session)` and must pass the session on), so a
+job retried after a crash, a failure or an expired lease never applies its
+effects twice. Without transactions handlers get `session=None` and must
+tolerate running again; either way only the worker holding the lease can mark
+a job done. Failed jobs are retried with exponential backoff and
+jitter, and end up with status "failed" after `max_attempts`.
+"""
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+OUTBOX = "outbox"
+
+
+class LeaseLost(Exception):
+    """The job was claimed by another worker after this one's lease expired."""
+
+
+class JobQueue:
+    def __init__(self, concurrency: int = 4, max_attempts: int = 8, backoff_base: float = 1.0,
+                 backoff_max: float = 600.0, poll_interval: float = 5.0, lease: float = 60.0,
+                 transactions: bool = False, registry=None):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.transactions = transactions
+        self.owner = uuid.uuid4().hex
+        self.handlers = {}
+        self.db = None
+        self._ready = None
+        self._queued = set()
+        self._tasks = []
+        self._running = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.total_run_seconds = 0.0
+        self.total_latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+        if registry is not None:
+            self.run_time = registry.histogram(
+                "job_run_seconds", "Background job handler run time", ("job", "outcome"))
+            self.latency = registry.histogram(
+                "job_latency_seconds", "Time from enqueue to successful completion", ("job",))
+        else:
+            self.run_time = self.latency = None
+
+    def handler(self, name: str):
+        def register(fn):
+            self.handlers[name] = fn
+            return fn
+        return register
+
+    def new_job(self, name: str, payload: dict) -> dict:
+        if name not in self.handlers:
+            raise ValueError(f"No handler registered for job {name!r}")
+        now = datetime.now(timezone.utc)
+        return {"_id": uuid.uuid4().hex, "name": name, "payload": payload, "status": "pending",
+                "attempts": 0, "run_at": now, "created_at": now}
+
+    async def enqueue(self, name: str, payload: dict, session=None) -> str:
+        """Insert a job; inside a transaction, call notify() after it commits."""
+        job = self.new_job(name, payload)
+        await self.db[OUTBOX].insert_one(job, session=session)
+        if session is None:
+            self.notify(job["_id"])
+        return job["_id"]
+
+    def notify(self, *job_ids):
+        # Before start() the poller's first pass will find them
+        if self._ready is None:
+            return
+        for job_id in job_ids:
+            if job_id not in self._queued:
+                self._queued.add(job_id)
+                self._ready.put_nowait(job_id)
+
+    async def start(self, db):
+        self.db = db
+        self._ready = asyncio.Queue()
+        self._queued.clear()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self, timeout: float = 10.0):
+        # Give running jobs a chance to finish; cancelled ones are picked up
+        # again once their lease expires.
+        deadline = time.monotonic() + timeout
+        while self._running and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+
+    async def _poll(self):
+        # The first pass doubles as startup recovery
+        while True:
+            try:
+                now = datetime.now(timezone.utc)
+                due = await self.db[OUTBOX].find(
+                    {"$or": [
+                        {"status": "pending", "run_at": {"$lte": now}},
+                        {"status": "running", "locked_until": {"$lt": now}},
+                    ]},
+                    {"_id": 1}
+                ).sort("run_at", 1).limit(1000).to_list(1000)
+                self.notify(*(job["_id"] for job in due))
+            except Exception:
+                logger.exception("Polling the job outbox failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self, job_id: str):
+        now = datetime.now(timezone.utc)
+        return await self.db[OUTBOX].find_one_and_update(
+            {"_id": job_id, "$or": [
+                {"status": "pending", "run_at": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "running", "owner": self.owner,
+                      "locked_until": now + timedelta(seconds=self.lease)},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _worker(self):
+        while True:
+            job_id = await self._ready.get()
+            self._queued.discard(job_id)
+            self._running += 1
+            try:
+                job = await self._claim(job_id)
+                if job is not None:
+                    await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job %s could not be processed", job_id)
+            finally:
+                self._running -= 1
+
+    async def _run(self, job: dict):
+        name = job["name"]
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        try:
+            if self.transactions:
+                async with await self.db.client.start_session() as session:
+                    await session.with_transaction(lambda s: self._apply(job, now, s))
+            else:
+                await self._apply(job, now)
+        except LeaseLost:
+            # Another worker reclaimed the job after this lease expired and
+            # runs it; in a transaction nothing of this attempt was committed.
+            logger.warning("Job %s (%s) lost its lease while running", job["_id"], name)
+            return
+        except Exception as e:
+            self._observe_run(name, "error", time.perf_counter() - started)
+            await self._fail(job, e)
+            return
+        self._observe_run(name, "ok", time.perf_counter() - started)
+        created_at = job["created_at"]
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        latency = (datetime.now(timezone.utc) - created_at).total_seconds()
+        self.completed += 1
+        self.total_latency_seconds += latency
+        self.max_latency_seconds = max(self.max_latency_seconds, latency)
+        if self.latency is not None:
+            self.latency.observe(latency, job=name)
+
+    async def _apply(self, job: dict, now: datetime, session=None):
+        if session is None:
+            await self.handlers[job["name"]](self.db, job["payload"], session=None)
+            if not await self._mark_done(job, now):
+                raise LeaseLost(job["_id"])
+            return
+        # Marking the job done first also locks its outbox document, so a
+        # worker that claimed it meanwhile conflicts instead of both committing.
+        if not await self._mark_done(job, now, session):
+            raise LeaseLost(job["_id"])
+        await self.handlers[job["name"]](self.db, job["payload"], session=session)
+
+    async def _mark_done(self, job: dict, now: datetime, session=None) -> bool:
+        # Only while this worker still holds the job
+        result = await self.db[OUTBOX].update_one(
+            {"_id": job["_id"], "owner": self.owner, "status": "running"},
+            {"$set": {"status": "done", "completed_at": now}, "$unset": {"locked_until": ""}},
+            session=session
+        )
+        return result.modified_count == 1
+
+    async def _fail(self, job: dict, error: Exception):
+        error_text = f"{type(error).__name__}: {error}"
+        if job["attempts"] >= self.max_attempts:
+            self.failed += 1
+            logger.error("Job %s (%s) failed permanently after %d attempts: %s",
+                         job["_id"], job["name"], job["attempts"], error_text)
+            update = {"status": "failed", "last_error": error_text}
+            delay = None
+        else:
+            self.retried += 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (job["attempts"] - 1))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning("Job %s (%s) attempt %d failed, retrying in %.1fs: %s",
+                           job["_id"], job["name"], job["attempts"], delay, error_text)
+            update = {"status": "pending", "last_error": error_text,
+                      "run_at": datetime.now(timezone.utc) + timedelta(seconds=delay)}
+        await self.db[OUTBOX].update_one(
+            {"_id": job["_id"], "owner": self.owner},
+            {"$set": update, "$unset": {"locked_until": ""}}
+        )
+        if delay is not None:
+            asyncio.get_running_loop().call_later(delay, self.notify, job["_id"])
+
+    def _observe_run(self, name: str, outcome: str, seconds: float):
+        self.total_run_seconds += seconds
+        if self.run_time is not None:
+            self.run_time.observe(seconds, job=name, outcome=outcome)
+
+    def stats(self) -> dict:
+        finished = self.completed + self.retried + self.failed
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self._ready.qsize() if self._ready else 0,
+            "running": self._running,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "avg_run_ms": round(1000 * self.total_run_seconds / finished, 3) if finished else 0.0,
+            "avg_latency_ms": round(1000 * self.total_latency_seconds / self.completed, 3) if self.completed else 0.0,
+            "max_latency_ms": round(1000 * self.max_latency_seconds, 3),
+        }
+
+    async def outbox_counts(self) -> dict:
+        counts = await self.db[OUTBOX].aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None)
+        return {row["_id"]: row["count"] for row in counts}
@@ -0,0 +1,304 @@
+"""Minimal in-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in a MetricsRegistry; `render()` returns
+what GET /api/metrics serves. Three sources feed it:
+
+- MetricsMiddleware: request latency per method, route template and status
+- CommandTimer: a pymongo CommandListener timing every command per collection
+  (the wire command: `find_one` is a `find`, `update_one` an `update`, ...)
+- EventLoopMonitor: how late the event loop wakes up from a short sleep,
+  i.e. how long something held it without yielding
+
+Metrics are updated from the event loop and, for command events, from the
+driver's threads, so every metric guards its samples with a lock.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self.samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            entries = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in entries:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        # Re-registering the same metric returns the existing one, so components
+        # constructed more than once (e.g. per app startup) keep their series.
+        existing = self._metrics.get(metric.name)
+        if existing is None:
+            self._metrics[metric.name] = metric
+            return metric
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+            raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+        return existing
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_stats(self, prefix: str, stats, counters=()):
+        """Expose the numeric fields of a `stats()` dict, read at scrape time.
+
+        Fields named in `counters` are exported as `<prefix>_<field>_total`,
+        the rest as gauges; non-numeric fields are skipped.
+        """
+        self._collectors.append((prefix, stats, set(counters)))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for prefix, stats, counters in self._collectors:
+            for field, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                kind = "counter" if field in counters else "gauge"
+                name = f"{prefix}_{field}_total" if kind == "counter" else f"{prefix}_{field}"
+                lines += [f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per method, route template and status.
+
+    The route template (`/api/products/{product_id}`) keeps label cardinality
+    bounded; requests that match no route are recorded as "unmatched".
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, slow_request_seconds: float = 0):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+        self.latency = registry.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route template and status",
+            ("method", "route", "status"))
+        self.in_progress = registry.gauge("http_requests_in_progress", "HTTP requests being served")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        self.in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_progress.dec()
+            # The router records the matched route on the (shared) scope
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            self.latency.observe(elapsed, method=scope["method"], route=template, status=str(status_code))
+            if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+                logger.warning("Slow request: %s %s -> %s in %.1f ms",
+                               scope["method"], template, status_code, 1000 * elapsed)
+
+
+def query_shape(command_name: str, command) -> dict:
+    """The filter of a command with every value replaced by "?"."""
+    def mask(value):
+        if isinstance(value, dict):
+            return {key: mask(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)) and value and isinstance(value[0], dict):
+            return [mask(item) for item in value]
+        return "?"
+
+    if command_name in ("find", "count", "distinct"):
+        return mask(command.get("filter", command.get("query", {})))
+    if command_name == "findAndModify":
+        return mask(command.get("query", {}))
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return mask(statements[0].get("q", {}))
+    if command_name == "aggregate":
+        return {"pipeline": [next(iter(stage), "?") for stage in command.get("pipeline", [])]}
+    return {}
+
+
+class CommandTimer(monitoring.CommandListener):
+    """Times MongoDB commands per collection; pass it to the client's event_listeners."""
+
+    def __init__(self, registry: MetricsRegistry, slow_command_seconds: float = 0):
+        self.slow_command_seconds = slow_command_seconds
+        self.duration = registry.histogram(
+            "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+            ("collection", "command"))
+        self.failures = registry.counter(
+            "mongodb_command_failures_total", "Failed MongoDB commands by collection and command",
+            ("collection", "command"))
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        command_name = event.command_name
+        collection = event.command.get("collection") if command_name == "getMore" else event.command.get(command_name)
+        # Handshakes, pings and session housekeeping do not target a collection
+        if not isinstance(collection, str):
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, command_name, event.command)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, command_name, command = pending
+        seconds = event.duration_micros / 1e6
+        self.duration.observe(seconds, collection=collection, command=command_name)
+        if failed:
+            self.failures.inc(collection=collection, command=command_name)
+        if self.slow_command_seconds and seconds >= self.slow_command_seconds:
+            logger.warning("Slow MongoDB command: %s on %s in %.1f ms, shape %s",
+                           command_name, collection, 1000 * seconds, query_shape(command_name, command))
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class EventLoopMonitor:
+    """Samples event-loop lag: how much later than requested a short sleep returns."""
+
+    def __init__(self, registry: MetricsRegistry, interval: float = 0.5):
+        self.interval = interval
+        self.lag = registry.histogram(
+            "event_loop_lag_seconds", "Delay between a scheduled and an actual event loop wake-up",
+            buckets=LOOP_LAG_BUCKETS)
+        self.last_lag = registry.gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self.lag.observe(lag)
+            self.last_lag.set(lag)
@@ -0,0 +1,117 @@
+"""Convert ISO-string timestamps to native BSON datetimes.
+
+Older documents stored created_at/updated_at as `.isoformat()` strings. This
+walks each collection in _id order, converting string values in chunked,
+unordered bulk writes. Progress is checkpointed in the `migrations`
+collection, so an interrupted run resumes where it stopped. From backend/:
+
+    python migrate_datetimes.py [--batch-size 1000] [--dry-run] [--restart]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+TIMESTAMP_FIELDS = {
+    "users": ["created_at"],
+    "products": ["created_at"],
+    "carts": ["updated_at"],
+    "orders": ["created_at"],
+}
+
+
+def parse_timestamp(value: str):
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_field(db, collection: str, field: str, batch_size: int,
+                        dry_run: bool = False, restart: bool = False):
+    checkpoint_id = f"datetimes:{collection}.{field}"
+    checkpoint = None if restart else await db.migrations.find_one({"_id": checkpoint_id})
+    last_id = checkpoint.get("last_id") if checkpoint else None
+    converted = checkpoint.get("converted", 0) if checkpoint else 0
+    failed = checkpoint.get("failed", 0) if checkpoint else 0
+
+    query = {field: {"$type": "string"}}
+    remaining = await db[collection].count_documents(query)
+    print(f"{collection}.{field}: {remaining} string values to convert"
+          + (f" (resuming after _id {last_id})" if last_id is not None else ""))
+    started = time.perf_counter()
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = await db[collection].find(batch_query, {"_id": 1, field: 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            try:
+                parsed = parse_timestamp(doc[field])
+            except ValueError:
+                failed += 1
+                print(f"  skipping {collection} _id={doc['_id']}: unparseable {field}={doc[field]!r}")
+                continue
+            # Matching on the old value leaves documents rewritten since the read alone
+            operations.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: parsed}}))
+
+        if operations and not dry_run:
+            result = await db[collection].bulk_write(operations, ordered=False)
+            converted += result.modified_count
+        else:
+            converted += len(operations)
+        last_id = batch[-1]["_id"]
+
+        if not dry_run:
+            await db.migrations.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "converted": converted, "failed": failed,
+                          "updated_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
+        rate = converted / max(time.perf_counter() - started, 1e-9)
+        print(f"  {collection}.{field}: {converted} converted, {failed} failed ({rate:.0f} docs/s)")
+
+    if not dry_run:
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"done": True, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    return converted, failed
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    total_failed = 0
+    try:
+        for collection, fields in TIMESTAMP_FIELDS.items():
+            for field in fields:
+                _, failed = await migrate_field(db, collection, field, args.batch_size, args.dry_run, args.restart)
+                total_failed += failed
+    finally:
+        client.close()
+    return 1 if total_failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints")
+    sys.exit(asyncio.run(main(parser.parse_args())))
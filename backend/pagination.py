@@ -0,0 +1,89 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+
+# Keyset pagination: documents are ordered by (sort_field, id) and a cursor
+# carries the last row's values, so each page is an index range scan instead
+# of a skip over everything before it.
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    # Cursor values end up inside a query filter: only scalars and encoded
+    # datetimes are accepted, never an object that could act as an operator.
+    if isinstance(value, dict) and value.keys() == {"$dt"} and isinstance(value["$dt"], str):
+        try:
+            return datetime.fromisoformat(value["$dt"])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return [_decode_value(v) for v in values]
+
+
+def parse_sort(sort: str, allowed, default: str):
+    sort = sort or default
+    direction = -1 if sort.startswith("-") else 1
+    field = sort.lstrip("-+")
+    if field not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field '{field}'. Allowed: {', '.join(sorted(allowed))}"
+        )
+    return field, direction
+
+
+def keyset_filter(field: str, direction: int, value, last_id: str) -> dict:
+    # Mongo orders null before every other value, so rows with a missing sort
+    # field sit at the start of an ascending scan and at the end of a descending one.
+    op = "$gt" if direction == 1 else "$lt"
+    if value is None:
+        clauses = [{field: None, "id": {op: last_id}}]
+        if direction == 1:
+            clauses.append({field: {"$ne": None}})
+    else:
+        clauses = [{field: {op: value}}, {field: value, "id": {op: last_id}}]
+        if direction == -1:
+            clauses.append({field: None})
+    return {"$or": clauses}
+
+
+async def paginate(collection, query: dict, field: str, direction: int, limit: int,
+                   cursor: str = None, projection: dict = None):
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, keyset_filter(field, direction, values[0], values[1])]}
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [(field, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor([docs[-1].get(field), docs[-1]['id']])
+    return docs, next_cursor
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+# Pinning min/max rounds to the configured cost makes passlib flag any stored
+# hash with a different cost, so login can transparently rehash it.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+# Module-level so they can be pickled into a process pool
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update_password(password: str, hashed: str):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def load_backend():
+    # passlib resolves and loads the bcrypt backend on first use
+    pwd_context.handler("bcrypt").get_backend()
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs bcrypt in a worker pool so it never blocks the event loop.
+
+    `executor` is "thread" (bcrypt releases the GIL), "process", or "inline"
+    (runs on the loop, only useful as a benchmark baseline). At most
+    `max_concurrency` hashes run at once; callers beyond that wait, and once
+    `max_queue` callers are waiting new ones are rejected with PasswordHasherBusy.
+    """
+
+    def __init__(self, executor: str = "thread", workers: int = None,
+                 max_concurrency: int = None, max_queue: int = 0):
+        if executor not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.executor_kind = executor
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_concurrency = max_concurrency or self.workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    @property
+    def executor(self):
+        if self._executor is None and self.executor_kind != "inline":
+            pool = ProcessPoolExecutor if self.executor_kind == "process" else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def warm_up(self):
+        """Start every pool worker and load the bcrypt backend in it."""
+        if self.executor_kind == "inline":
+            load_backend()
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, load_backend) for _ in range(self.workers)))
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed: str):
+        return await self._run(verify_and_update_password, password, hashed)
+
+    async def _run(self, fn, *args):
+        if self.max_queue and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        acquired = False
+        try:
+            async with self._semaphore:
+                self.waiting -= 1
+                acquired = True
+                started_at = time.perf_counter()
+                self.in_flight += 1
+                try:
+                    if self.executor_kind == "inline":
+                        return fn(*args)
+                    return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+                finally:
+                    self.in_flight -= 1
+                    self.completed += 1
+                    self.total_wait_seconds += started_at - queued_at
+                    self.total_run_seconds += time.perf_counter() - started_at
+        finally:
+            if not acquired:
+                self.waiting -= 1
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.total_wait_seconds / self.completed, 3) if self.completed else 0.0,
+            "avg_run_ms": round(1000 * self.total_run_seconds / self.completed, 3) if self.completed else 0.0,
+        }
@@ -0,0 +1,206 @@
+"""Streaming bulk product import: CSV or NDJSON in, chunked unordered upserts out.
+
+Each row is validated against the Product model and must carry an `id`, so
+re-running a file updates rather than duplicates; valid rows are upserted by
+`id` in unordered bulk_write batches, invalid rows are reported with their row
+number. Only the columns a row carries are written to an existing product;
+model defaults (rating, stock, ...) apply to new products only, and derived
+fields (effective_price) are recomputed from the stored document after each
+batch. The same pipeline backs POST /api/admin/products/import and this CLI.
+From backend/:
+
+    python product_import.py catalog.csv
+    python product_import.py catalog.ndjson --dry-run --chunk-size 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+MAX_REPORTED_ERRORS = 1000
+LIST_SEPARATOR = "|"
+
+
+def decode_line(line: bytes):
+    # An undecodable line becomes that row's error instead of aborting the import
+    try:
+        return line.decode("utf-8-sig").rstrip("\r")
+    except UnicodeDecodeError as e:
+        return ValueError(f"Line is not valid UTF-8: {e.reason} at byte {e.start}")
+
+
+async def iter_lines(chunks):
+    # Split on raw bytes so multi-byte characters across chunk edges decode cleanly
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield decode_line(line)
+    if pending:
+        yield decode_line(pending)
+
+
+async def iter_file_chunks(path: str, chunk_size: int = 1 << 16):
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def normalize_csv_row(row: dict) -> dict:
+    # Empty cells fall back to model defaults; images are pipe-separated (empty means none)
+    normalized = {}
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+        key = key.strip()
+        if key == "images":
+            normalized[key] = [image.strip() for image in value.split(LIST_SEPARATOR) if image.strip()]
+        elif value != "":
+            normalized[key] = value
+    return normalized
+
+
+async def iter_csv_rows(lines):
+    header = None
+    record = ""
+    row_number = 0
+    async for line in lines:
+        if isinstance(line, Exception):
+            # The row this line belonged to is lost; start afresh at the next line
+            record = ""
+            row_number += 1
+            yield row_number, line
+            continue
+        # A quoted field may span lines: keep reading until quotes balance
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = values
+            continue
+        row_number += 1
+        yield row_number, normalize_csv_row(dict(zip(header, values)))
+
+
+async def iter_ndjson_rows(lines):
+    row_number = 0
+    async for line in lines:
+        if isinstance(line, Exception):
+            row_number += 1
+            yield row_number, line
+            continue
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, e
+            continue
+        yield row_number, row if isinstance(row, dict) else ValueError("Row is not a JSON object")
+
+
+def iter_rows(lines, import_format: str):
+    return iter_csv_rows(lines) if import_format == "csv" else iter_ndjson_rows(lines)
+
+
+def upsert_operation(product) -> UpdateOne:
+    # Derived fields may depend on stored columns the row leaves out, so they
+    # are recomputed in the database once the batch is written
+    derived = getattr(product, "derived_fields", {})
+    provided = product.model_dump(exclude_unset=True, exclude=set(derived))
+    defaults = {field: value for field, value in product.model_dump(exclude=set(derived)).items()
+                if field not in provided}
+    return UpdateOne({"id": provided["id"]}, {"$set": provided, "$setOnInsert": defaults}, upsert=True)
+
+
+async def import_products(db, rows, model, dry_run: bool = False, chunk_size: int = 1000):
+    report = {"rows": 0, "valid": 0, "inserted": 0, "updated": 0, "unchanged": 0,
+              "failed": 0, "errors": [], "dry_run": dry_run}
+    batch = []
+    batch_rows = []
+    batch_ids = []
+
+    def add_error(row_number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "errors": errors})
+
+    async def flush():
+        if not batch:
+            return
+        try:
+            result = await db.products.bulk_write(batch, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                add_error(batch_rows[write_error["index"]], [write_error.get("errmsg")])
+        report["inserted"] += details.get("nUpserted", 0)
+        report["updated"] += details.get("nModified", 0)
+        report["unchanged"] += details.get("nMatched", 0) - details.get("nModified", 0)
+        derived = getattr(model, "derived_fields", None)
+        if derived:
+            await db.products.update_many({"id": {"$in": batch_ids}}, [{"$set": derived}])
+        batch.clear()
+        batch_rows.clear()
+        batch_ids.clear()
+
+    async for row_number, row in rows:
+        report["rows"] += 1
+        if isinstance(row, Exception):
+            add_error(row_number, [str(row)])
+            continue
+        try:
+            product = model.model_validate(row)
+        except ValidationError as e:
+            add_error(row_number, [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ])
+            continue
+        if "id" not in product.model_fields_set:
+            add_error(row_number, ["id: Field required"])
+            continue
+        report["valid"] += 1
+        if dry_run:
+            continue
+        batch.append(upsert_operation(product))
+        batch_rows.append(row_number)
+        batch_ids.append(product.id)
+        if len(batch) >= chunk_size:
+            await flush()
+    await flush()
+    return report
+
+
+async def main(args):
+    import server
+
+    import_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    rows = iter_rows(iter_lines(iter_file_chunks(args.path)), import_format)
+    db = server.connect()
+    report = await import_products(db, rows, server.Product, dry_run=args.dry_run, chunk_size=args.chunk_size)
+    if not args.dry_run and report["inserted"] + report["updated"]:
+        await server.bump_catalog_version()
+    server.client.close()
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV (with a header row) or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    parser.add_argument("--dry-run", action="store_true", help="validate every row without writing")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    sys.exit(asyncio.run(main(parser.parse_args())))
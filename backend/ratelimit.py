@@ -0,0 +1,135 @@
+"""Token-bucket rate limiting for expensive endpoints.
+
+Each policy refills `limit` tokens per `period` seconds up to `burst`; every
+attempt takes one. Buckets live in a sharded in-process table (each shard an
+LRU bounded to `max_keys / shards` entries, so a flood of distinct keys cannot
+grow memory without bound). With `shared=True` a bucket that passes locally is
+also charged in a Mongo collection with one atomic pipeline update, so limits
+hold across workers; attempts already over the local limit are rejected
+without touching the database.
+"""
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+RATE_LIMITS = "rate_limits"
+
+
+class RateLimited(Exception):
+    def __init__(self, policy: str, retry_after: float):
+        super().__init__(f"Rate limit {policy} exceeded")
+        self.policy = policy
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    limit: int
+    period: float
+    burst: int
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Policy":
+        """Parse "limit/period_seconds[:burst]", e.g. "10/60" or "10/60:20"."""
+        rate, _, burst = spec.partition(":")
+        limit, _, period = rate.partition("/")
+        return cls(name, int(limit), float(period or 1), int(burst or limit))
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+
+class _Shard:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, policy: Policy, now: float) -> float:
+        with self.lock:
+            tokens, updated_at = self.buckets.pop(key, (policy.burst, now))
+            tokens = min(policy.burst, tokens + (now - updated_at) * policy.rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / policy.rate
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                # Least recently seen first; an evicted bucket restarts full
+                self.buckets.popitem(last=False)
+            return retry_after
+
+
+class RateLimiter:
+    def __init__(self, policies, shards: int = 16, max_keys: int = 100000, shared: bool = False, registry=None):
+        self.policies = {policy.name: policy for policy in policies}
+        self.shared = shared
+        self._shards = [_Shard(max(1, max_keys // shards)) for _ in range(shards)]
+        self.allowed = {name: 0 for name in self.policies}
+        self.rejected = {name: 0 for name in self.policies}
+        self.rejections = registry.counter(
+            "rate_limit_rejections_total", "Requests rejected by a rate limit policy", ("policy",)
+        ) if registry is not None else None
+
+    def _local(self, policy: Policy, key: str, now: float) -> float:
+        shard = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        return shard.take((policy.name, key), policy, now)
+
+    async def _shared(self, db, policy: Policy, key: str) -> float:
+        now = datetime.now(timezone.utc)
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        bucket = await db[RATE_LIMITS].find_one_and_update(
+            {"_id": f"{policy.name}:{key}"},
+            [
+                {"$set": {"tokens": {"$min": [
+                    policy.burst,
+                    {"$add": [{"$ifNull": ["$tokens", policy.burst]}, {"$multiply": [elapsed, policy.rate]}]},
+                ]}}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                    "updated_at": now,
+                    # A full bucket carries no state worth keeping
+                    "expires_at": now + timedelta(seconds=policy.burst / policy.rate),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / policy.rate
+
+    async def hit(self, db, checks):
+        """Charge one attempt to each (policy, key); raise RateLimited on the first denial."""
+        for policy_name, key in checks:
+            if not key:
+                continue
+            policy = self.policies[policy_name]
+            retry_after = self._local(policy, key, time.monotonic())
+            if not retry_after and self.shared:
+                retry_after = await self._shared(db, policy, key)
+            if retry_after:
+                self.rejected[policy_name] += 1
+                if self.rejections is not None:
+                    self.rejections.inc(policy=policy_name)
+                raise RateLimited(policy_name, math.ceil(retry_after))
+            self.allowed[policy_name] += 1
+
+    def stats(self) -> dict:
+        return {
+            "shared": self.shared,
+            "tracked_keys": sum(len(shard.buckets) for shard in self._shards),
+            "policies": {
+                name: {"limit": policy.limit, "period": policy.period, "burst": policy.burst,
+                       "allowed": self.allowed[name], "rejected": self.rejected[name]}
+                for name, policy in self.policies.items()
+            },
+        }
@@ -0,0 +1,233 @@
+"""Frequently-bought-together recommendations from product co-occurrence.
+
+`product_pairs` is the co-occurrence matrix in coordinate form: one document
+per ordered pair of distinct products bought in the same order, counting those
+orders. Both directions are stored, so a product's row is one index range.
+`recommendations` holds each product's top-N row by count, so serving a
+product's list is a single _id lookup.
+
+create_order enqueues a job that increments the pairs of the new order and
+recomputes the top-N lists of its products; with checkout transactions on, the
+job queue commits these writes together with the job's completion, so a
+retried job never counts an order twice. To recompute everything from
+db.orders (e.g. after a backfill; orders placed while it runs are not
+counted), from backend/:
+
+    python recommendations.py --rebuild
+
+The rebuild streams orders and accumulates the matrix with NumPy: pairs are
+encoded as int64 keys (row << 32 | column) and buffered up to --chunk-pairs,
+then sorted, reduced and merged into the running totals, so memory grows with
+the number of distinct pairs rather than with order history.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from itertools import permutations
+from pathlib import Path
+
+import numpy as np
+from pymongo import UpdateOne
+
+from indexes import INDEXES
+
+PAIRS = "product_pairs"
+RECOMMENDATIONS = "recommendations"
+TOP_N = 20
+# Pairs grow quadratically with basket size; very large (bulk) orders say
+# little about what goes together.
+MAX_BASKET = 50
+INSERT_BATCH = 5000
+
+
+def basket(items) -> list:
+    product_ids = dict.fromkeys(item['product_id'] for item in items if item.get('product_id'))
+    return list(product_ids)[:MAX_BASKET]
+
+
+def pair_id(product_id: str, other: str) -> str:
+    return f"{product_id}|{other}"
+
+
+async def top_related(db, product_id: str, top_n: int = TOP_N, session=None) -> list:
+    pairs = await db[PAIRS].find(
+        {"product_id": product_id}, {"_id": 0, "other": 1, "count": 1}, session=session
+    ).sort([("count", -1), ("other", 1)]).limit(top_n).to_list(top_n)
+    return [{"product_id": pair['other'], "count": pair['count']} for pair in pairs]
+
+
+async def record_basket(db, product_ids: list, top_n: int = TOP_N, session=None):
+    if len(product_ids) < 2:
+        return
+    await db[PAIRS].bulk_write([
+        UpdateOne(
+            {"_id": pair_id(product_id, other)},
+            {"$inc": {"count": 1}, "$setOnInsert": {"product_id": product_id, "other": other}},
+            upsert=True,
+        )
+        for product_id, other in permutations(product_ids, 2)
+    ], ordered=False, session=session)
+    now = datetime.now(timezone.utc)
+    updates = []
+    for product_id in product_ids:
+        related = await top_related(db, product_id, top_n, session)
+        updates.append(UpdateOne({"_id": product_id}, {"$set": {"items": related, "updated_at": now}}, upsert=True))
+    await db[RECOMMENDATIONS].bulk_write(updates, ordered=False, session=session)
+
+
+async def related_lists(db, product_ids) -> dict:
+    docs = await db[RECOMMENDATIONS].find({"_id": {"$in": list(product_ids)}}).to_list(None)
+    found = {doc['_id']: doc['items'] for doc in docs}
+    return {product_id: found.get(product_id, []) for product_id in product_ids}
+
+
+class CoOccurrence:
+    """Sparse co-occurrence counts as sorted int64 pair keys and their counts."""
+
+    def __init__(self, chunk_pairs: int = 1_000_000):
+        self.chunk_pairs = chunk_pairs
+        self.index = {}
+        self.product_ids = []
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self._pending = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _row(self, product_id: str) -> int:
+        row = self.index.get(product_id)
+        if row is None:
+            row = self.index[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+        return row
+
+    def add(self, product_ids: list):
+        rows = [self._row(product_id) for product_id in product_ids]
+        self._pending.extend((row << 32) | column for row, column in permutations(rows, 2))
+        if len(self._pending) >= self.chunk_pairs:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        keys, counts = np.unique(np.array(self._pending, dtype=np.int64), return_counts=True)
+        self._pending = []
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        order = np.argsort(keys, kind="stable")
+        keys, counts = keys[order], counts[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        starts = np.flatnonzero(first)
+        self.keys = keys[starts]
+        self.counts = np.add.reduceat(counts, starts)
+
+    def top(self, top_n: int):
+        """(rows, columns, counts) of every row's top_n entries, rows ascending, counts descending."""
+        self.flush()
+        rows = self.keys >> 32
+        columns = self.keys & 0xFFFFFFFF
+        # Ties go to the lexicographically smaller product id, as in top_related
+        name_rank = np.empty(len(self.product_ids), dtype=np.int64)
+        name_rank[np.argsort(np.array(self.product_ids))] = np.arange(len(self.product_ids))
+        order = np.lexsort((name_rank[columns], -self.counts, rows))
+        rows, columns, counts = rows[order], columns[order], self.counts[order]
+        positions = np.arange(len(rows))
+        row_start = np.ones(len(rows), dtype=bool)
+        row_start[1:] = rows[1:] != rows[:-1]
+        rank = positions - np.maximum.accumulate(np.where(row_start, positions, 0))
+        keep = rank < top_n
+        return rows[keep], columns[keep], counts[keep]
+
+
+async def insert_batched(collection, docs):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= INSERT_BATCH:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def rebuild(db, top_n: int = TOP_N, chunk_pairs: int = 1_000_000, batch_size: int = 10000):
+    matrix = CoOccurrence(chunk_pairs)
+    orders = 0
+    async for order in db.orders.find({}, {"_id": 0, "items.product_id": 1}).batch_size(batch_size):
+        product_ids = basket(order.get('items', []))
+        if len(product_ids) >= 2:
+            matrix.add(product_ids)
+        orders += 1
+    matrix.flush()
+    if not len(matrix):
+        await db[PAIRS].delete_many({})
+        await db[RECOMMENDATIONS].delete_many({})
+        return {"orders": orders, "products": 0, "pairs": 0}
+
+    # Build into scratch collections and swap them in, so readers never see
+    # a half-built matrix.
+    product_ids = matrix.product_ids
+    pairs_target, recommendations_target = f"{PAIRS}_rebuild", f"{RECOMMENDATIONS}_rebuild"
+    await db[pairs_target].drop()
+    await db[recommendations_target].drop()
+
+    def pair_docs():
+        for start in range(0, len(matrix), INSERT_BATCH):
+            end = start + INSERT_BATCH
+            for key, count in zip(matrix.keys[start:end].tolist(), matrix.counts[start:end].tolist()):
+                product_id, other = product_ids[key >> 32], product_ids[key & 0xFFFFFFFF]
+                yield {"_id": pair_id(product_id, other), "product_id": product_id, "other": other, "count": count}
+
+    await insert_batched(db[pairs_target], pair_docs())
+
+    rows, columns, counts = matrix.top(top_n)
+    now = datetime.now(timezone.utc)
+
+    def recommendation_docs():
+        current, items = None, []
+        for row, column, count in zip(rows.tolist(), columns.tolist(), counts.tolist()):
+            if row != current:
+                if items:
+                    yield {"_id": product_ids[current], "items": items, "updated_at": now}
+                current, items = row, []
+            items.append({"product_id": product_ids[column], "count": count})
+        if items:
+            yield {"_id": product_ids[current], "items": items, "updated_at": now}
+
+    await insert_batched(db[recommendations_target], recommendation_docs())
+    # Indexes move with a renamed collection: build them before the swap, so
+    # the live collection is never without them
+    await db[pairs_target].create_indexes(INDEXES[PAIRS])
+    await db[pairs_target].rename(PAIRS, dropTarget=True)
+    await db[recommendations_target].rename(RECOMMENDATIONS, dropTarget=True)
+    return {"orders": orders, "products": len(product_ids), "pairs": len(matrix)}
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.rebuild:
+            report = await rebuild(db, args.top_n, args.chunk_pairs)
+            print(f"Rebuilt {report['pairs']} product pairs for {report['products']} products "
+                  f"from {report['orders']} orders")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recompute pairs and recommendations from db.orders")
+    parser.add_argument("--top-n", type=int, default=TOP_N, help="recommendations kept per product")
+    parser.add_argument("--chunk-pairs", type=int, default=1_000_000,
+                        help="pairs buffered before they are merged into the matrix")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,73 @@
+"""Production launcher: uvicorn with several worker processes and a drain period.
+
+On SIGTERM/SIGINT each worker first marks itself draining, so
+/api/health/ready answers 503 and the load balancer stops routing to it,
+keeps serving for `--drain-seconds`, and only then lets uvicorn stop
+accepting connections and wait up to `--graceful-timeout` for in-flight
+requests before the lifespan shuts down the job queue, the password hasher
+pool and the Mongo client. A second SIGINT exits immediately. From backend/:
+
+    python run_server.py --port 8001 --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class DrainingServer(uvicorn.Server):
+    def __init__(self, config, drain_seconds: float):
+        super().__init__(config)
+        self.drain_seconds = drain_seconds
+        self._draining = False
+
+    def handle_exit(self, sig, frame):
+        if self._draining or not self.drain_seconds:
+            super().handle_exit(sig, frame)
+            return
+        self._draining = True
+        # uvicorn imported the app by name, so this is the module serving requests
+        app_module = sys.modules.get("server")
+        if app_module is not None:
+            app_module.lifecycle["draining"] = True
+        logger.info("Draining for %.1fs before shutting down", self.drain_seconds)
+        timer = threading.Timer(self.drain_seconds, super().handle_exit, (sig, frame))
+        timer.daemon = True
+        timer.start()
+
+
+def main(args):
+    config = uvicorn.Config(
+        "server:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+    )
+    server = DrainingServer(config, args.drain_seconds)
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API with uvicorn worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8001)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--drain-seconds", type=float, default=float(os.environ.get("DRAIN_SECONDS", 5)),
+                        help="keep serving, reporting not-ready, for this long after a shutdown signal")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get("GRACEFUL_TIMEOUT", 30)),
+                        help="seconds to wait for in-flight requests once the drain period is over")
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    main(parser.parse_args())
@@ -0,0 +1,123 @@
+import math
+import re
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into",
+    "is", "it", "its", "of", "on", "or", "the", "to", "with", "your", "you",
+})
+
+# Relative weight of a term occurrence in each searchable Product field
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "concern": 2.0,
+    "ingredients": 1.5,
+    "description": 1.0,
+}
+
+SUFFIXES = (
+    ("ational", "ate"), ("ization", "ize"), ("fulness", "ful"), ("iveness", "ive"),
+    ("ousness", "ous"), ("ically", "ic"), ("ness", ""), ("ment", ""), ("ing", ""),
+    ("ies", "y"), ("ied", "y"), ("edly", ""), ("ed", ""), ("ly", ""), ("es", ""), ("s", ""),
+)
+
+
+def stem(word: str) -> str:
+    # Light suffix stripping: enough to fold "serums"/"serum", "brightening"/"brighten"
+    # and "hydrating"/"hydrate" together without a full Porter implementation.
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                return word
+            if suffix == "es" and not word.endswith(("sses", "shes", "ches", "xes", "zes")):
+                continue
+            word = word[: len(word) - len(suffix)] + replacement
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    return [stem(token) for token in TOKEN_RE.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+class SearchIndex:
+    """In-memory inverted index over products, ranked with BM25."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0.0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def build(self, products):
+        self.postings = defaultdict(dict)
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0.0
+        for product in products:
+            self.add(product)
+
+    def add(self, product: dict):
+        doc_id = product['id']
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        terms = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product.get(field)):
+                terms[term] += weight
+        length = sum(terms.values())
+        for term, frequency in terms.items():
+            self.postings[term][doc_id] = frequency
+        self.doc_terms[doc_id] = dict(terms)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0.0)
+
+    def matching(self, query: str) -> set:
+        """Every document containing a query term, unranked."""
+        matches = set()
+        for term in set(tokenize(query)):
+            matches.update(self.postings.get(term, ()))
+        return matches
+
+    def search(self, query: str, limit: int = None) -> list:
+        terms = set(tokenize(query))
+        if not terms or not self.doc_terms:
+            return []
+        doc_count = len(self.doc_terms)
+        avg_length = self.total_length / doc_count or 1.0
+        scores = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
@@ -1,33 +1,263 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import io
+import csv
+import json
+import time
+import hashlib
+import asyncio
+import orjson
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, model_validator
+from typing import ClassVar, List, Optional, Literal
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
-from passlib.context import CryptContext
+from cache import TTLCache
+from passwords import PasswordHasher, PasswordHasherBusy
+from search_index import SearchIndex, FIELD_WEIGHTS
+from suggest_index import SuggestIndex, SUGGEST_FIELDS, SUMMARY_FIELDS
+from pagination import encode_cursor, decode_cursor, parse_sort, paginate
+from indexes import PRODUCT_SORT_FIELDS, ORDER_SORT_FIELDS, ensure_indexes
+from metrics import MetricsRegistry, MetricsMiddleware, CommandTimer, EventLoopMonitor
+from compression import CompressionMiddleware, Payload, SUPPORTED_ENCODINGS, choose_encoding, encoded_etag, split_etag
+from jobs import JobQueue, OUTBOX
+from ratelimit import RateLimiter, RateLimited, Policy
+import analytics
+import recommendations
+import product_import
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Metrics: request latency per route template, MongoDB command latency per
+# collection and event-loop lag, served in Prometheus format on /api/metrics.
+# Requests and commands slower than the *_SLOW_*_MS thresholds are also logged.
+METRICS_SLOW_REQUEST_MS = float(os.environ.get('METRICS_SLOW_REQUEST_MS', 0))
+METRICS_SLOW_COMMAND_MS = float(os.environ.get('METRICS_SLOW_COMMAND_MS', 0))
+EVENT_LOOP_LAG_INTERVAL = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL', 0.5))
+metrics = MetricsRegistry()
+mongo_command_timer = CommandTimer(metrics, slow_command_seconds=METRICS_SLOW_COMMAND_MS / 1000)
+event_loop_monitor = EventLoopMonitor(metrics, interval=EVENT_LOOP_LAG_INTERVAL)
+
+# MongoDB connection: opened by the app lifespan (or connect() in scripts), so
+# importing this module does no I/O. Pool sizes and timeouts come from the
+# environment and fall back to the driver defaults.
+MONGO_CLIENT_OPTIONS = {
+    option: int(os.environ[name]) for option, name in (
+        ("maxPoolSize", "MONGO_MAX_POOL_SIZE"),
+        ("minPoolSize", "MONGO_MIN_POOL_SIZE"),
+        ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS"),
+        ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS"),
+        ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS"),
+        ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+        ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+    ) if os.environ.get(name)
+}
+client = None
+db = None
+
+def connect():
+    global client, db
+    if client is None:
+        client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'], tz_aware=True, event_listeners=[mongo_command_timer], **MONGO_CLIENT_OPTIONS
+        )
+        db = client[os.environ['DB_NAME']]
+    return db
+
+# Startup and health: the lifespan warms connections, the search index, the
+# default catalog page and the password hashing pool before the worker reports
+# ready; a draining worker reports not ready while it finishes in-flight work.
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', 'true').lower() == 'true'
+MONGO_WARM_CONNECTIONS = int(os.environ.get('MONGO_WARM_CONNECTIONS', 4))
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', 2))
+lifecycle = {"ready": False, "draining": False}
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    executor=os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None,
+    max_concurrency=int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 0)) or None,
+    max_queue=int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 0))
+)
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 security = HTTPBearer()
 
-app = FastAPI()
+# Principal cache: authenticated users by token subject. With
+# AUTH_TRUST_TOKEN_CLAIMS enabled, routes that only need the user id take it
+# straight from the signed token and never touch db.users.
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get('AUTH_TRUST_TOKEN_CLAIMS', 'false').lower() == 'true'
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Rate limiting: login and registration attempts are limited per client IP and
+# per email before any user lookup or password hashing. Policies are
+# "limit/period_seconds[:burst]". RATE_LIMIT_SHARED also charges buckets in
+# Mongo so limits hold across workers. The client IP is the peer address,
+# which uvicorn's proxy_headers already rewrites for proxies listed in
+# FORWARDED_ALLOW_IPS. Set TRUSTED_PROXY_HOPS to the number of proxies in front
+# of the app only if they cannot be listed there; with it set, X-Forwarded-For
+# is read from any peer.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+rate_limiter = RateLimiter(
+    [
+        Policy.parse("login_ip", os.environ.get('RATE_LIMIT_LOGIN_IP', '20/60:30')),
+        Policy.parse("login_email", os.environ.get('RATE_LIMIT_LOGIN_EMAIL', '5/60:10')),
+        Policy.parse("register_ip", os.environ.get('RATE_LIMIT_REGISTER_IP', '5/60:10')),
+        Policy.parse("register_email", os.environ.get('RATE_LIMIT_REGISTER_EMAIL', '3/300')),
+    ],
+    shards=int(os.environ.get('RATE_LIMIT_SHARDS', 16)),
+    max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)),
+    shared=os.environ.get('RATE_LIMIT_SHARED', 'false').lower() == 'true',
+    registry=metrics
+)
+
+# Catalog cache
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 512))
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 300))
+CATALOG_VERSION_POLL_INTERVAL = float(os.environ.get('CATALOG_VERSION_POLL_INTERVAL', 2))
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+catalog_state = {"version": None, "checked_at": 0.0}
+
+# Product search: "memory" serves queries from an in-process inverted index,
+# "mongo" falls back to a MongoDB text index on the same fields.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'memory')
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', 1000))
+search_index = SearchIndex()
+search_state = {"version": None, "rebuild": None}
+# Search-as-you-type suggestions always come from memory; the prefix index is
+# rebuilt and updated together with the search index.
+SUGGEST_DEFAULT_LIMIT = int(os.environ.get('SUGGEST_DEFAULT_LIMIT', 8))
+SUGGEST_MAX_LIMIT = int(os.environ.get('SUGGEST_MAX_LIMIT', 20))
+suggest_index = SuggestIndex()
+
+# Conditional GET: catalog responses carry a strong ETag derived from the
+# catalog version and the canonical request URL, so a client or CDN holding
+# the current representation gets a 304 without the query or serialization.
+CATALOG_CACHE_CONTROL = os.environ.get('CATALOG_CACHE_CONTROL', 'public, max-age=60')
+
+# Serialization fast path: documents were validated by the models when they
+# were written, so list endpoints project exactly the model fields and encode
+# them with orjson instead of rebuilding and re-dumping a pydantic model per row.
+# Catalog listings additionally cache the encoded bytes per catalog version.
+SERIALIZE_TRUSTED_DOCUMENTS = os.environ.get('SERIALIZE_TRUSTED_DOCUMENTS', 'true').lower() == 'true'
+
+# Compression: responses of at least COMPRESSION_MIN_SIZE bytes are sent with
+# brotli or gzip per Accept-Encoding. Cached catalog payloads keep their
+# compressed variants, so each is compressed once per catalog version.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))
+
+# Checkout: orders are priced on the server, stock is reserved with conditional
+# decrements and the order insert plus cart removal commit in one transaction
+# where the deployment has them. CHECKOUT_TRANSACTIONS=auto enables them on a
+# replica set or mongos and not on a standalone mongod; true/false force it.
+CHECKOUT_TRANSACTIONS = os.environ.get('CHECKOUT_TRANSACTIONS', 'auto').lower()
+transaction_state = {"enabled": False}
+FREE_SHIPPING_THRESHOLD = float(os.environ.get('FREE_SHIPPING_THRESHOLD', 500))
+SHIPPING_FEE = float(os.environ.get('SHIPPING_FEE', 50))
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+# Per product line, in the cart as well as in an order
+MAX_LINE_QUANTITY = 100
+# Reservations of a checkout that died before settling them are reclaimed after this long
+RESERVATION_TIMEOUT = float(os.environ.get('RESERVATION_TIMEOUT', 900))
+RESERVATION_REAP_INTERVAL = float(os.environ.get('RESERVATION_REAP_INTERVAL', 60))
+
+# Background jobs: side effects of checkout and admin writes (sales rollups, co-purchase counts)
+# run from a durable outbox after the request has returned. Where transactions are enabled a
+# job's writes commit together with its completion, so a redelivered job is not applied twice.
+job_queue = JobQueue(
+    concurrency=int(os.environ.get('JOB_CONCURRENCY', 4)),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', 8)),
+    backoff_base=float(os.environ.get('JOB_BACKOFF_BASE', 1)),
+    poll_interval=float(os.environ.get('JOB_POLL_INTERVAL', 5)),
+    lease=float(os.environ.get('JOB_LEASE', 60)),
+    registry=metrics
+)
+
+# Facets: price bands are [lower, upper) on the effective (offer) price; the
+# last band is open-ended.
+PRICE_BANDS = [float(bound) for bound in os.environ.get('PRICE_BANDS', '0,250,500,1000,2000').split(',')]
+
+# Recommendations: each product's precomputed "frequently bought together"
+# list, updated by a job per order; other workers see an update once their
+# cached copy expires.
+RECOMMENDATIONS_TOP_N = int(os.environ.get('RECOMMENDATIONS_TOP_N', recommendations.TOP_N))
+RECOMMENDATION_CACHE_SIZE = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 4096))
+RECOMMENDATION_CACHE_TTL = float(os.environ.get('RECOMMENDATION_CACHE_TTL', 300))
+recommendation_cache = TTLCache(maxsize=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL)
+
+# Pagination
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Order export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+ORDER_EXPORT_COLUMNS = [
+    "id", "created_at", "user_id", "order_status", "payment_method",
+    "payment_status", "total_amount", "item_count", "items", "address"
+]
+
+async def supports_transactions(database) -> bool:
+    # Multi-document transactions need a replica set member or a mongos
+    hello = await database.command("hello")
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+
+async def configure_transactions():
+    if CHECKOUT_TRANSACTIONS == "auto":
+        try:
+            enabled = await supports_transactions(db)
+        except Exception:
+            logger.warning("Could not determine the MongoDB topology; running without transactions", exc_info=True)
+            enabled = False
+    else:
+        enabled = CHECKOUT_TRANSACTIONS == "true"
+    transaction_state['enabled'] = enabled
+    job_queue.transactions = enabled
+    logger.info("Checkout transactions %s", "enabled" if enabled else "disabled")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect()
+    await configure_transactions()
+    await ensure_indexes(db)
+    await backfill_derived_fields()
+    if STARTUP_WARMUP:
+        try:
+            await warm_up()
+        except Exception:
+            # Only an optimization: serve cold rather than not at all
+            logger.exception("Warm-up failed")
+    else:
+        await ensure_search_index()
+    event_loop_task = asyncio.create_task(event_loop_monitor.run())
+    reaper_task = asyncio.create_task(reservation_reaper())
+    await job_queue.start(db)
+    lifecycle.update(ready=True, draining=False)
+    try:
+        yield
+    finally:
+        lifecycle['ready'] = False
+        event_loop_task.cancel()
+        reaper_task.cancel()
+        if search_state['rebuild'] is not None:
+            search_state['rebuild'].cancel()
+        await job_queue.stop()
+        password_hasher.shutdown()
+        client.close()
+
+app = FastAPI(lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -45,6 +275,10 @@ class UserCreate(BaseModel):
     name: str
     phone: Optional[str] = None
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = None
+    phone: Optional[str] = None
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -64,11 +298,31 @@ class Product(BaseModel):
     ingredients: Optional[str] = None
     how_to_use: Optional[str] = None
     in_stock: bool = True
+    stock: Optional[int] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # What the shopper pays (offer_price, else price): the price sort key,
+    # always derived from the other two and never taken from the client
+    effective_price: Optional[float] = None
+
+    # Stored fields recomputed from the document itself after partial writes
+    derived_fields: ClassVar[dict] = {"effective_price": {"$ifNull": ["$offer_price", "$price"]}}
+
+    @model_validator(mode="after")
+    def derive_effective_price(self):
+        self.effective_price = self.offer_price if self.offer_price is not None else self.price
+        return self
 
 class CartItem(BaseModel):
     product_id: str
-    quantity: int = 1
+    quantity: int = Field(1, le=MAX_LINE_QUANTITY)
+
+class CartBatchItem(BaseModel):
+    product_id: str
+    quantity: int = Field(1, le=MAX_LINE_QUANTITY)
+    mode: Literal["add", "set"] = "add"
+
+class CartBatch(BaseModel):
+    items: List[CartBatchItem] = Field(min_length=1, max_length=100)
 
 class Cart(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -90,11 +344,24 @@ class Address(BaseModel):
     pincode: str
     is_default: bool = False
 
+class OrderLine(BaseModel):
+    product_id: str
+    quantity: int = Field(1, ge=1, le=MAX_LINE_QUANTITY)
+
+class OrderCreate(BaseModel):
+    # Names, prices and totals sent by the client are ignored; without items
+    # the order is placed for the contents of the cart
+    items: Optional[List[OrderLine]] = Field(None, max_length=100)
+    address: dict
+    payment_method: Literal["online", "cod"]
+
 class Order(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     items: List[dict]
+    subtotal: Optional[float] = None
+    shipping: Optional[float] = None
     total_amount: float
     address: dict
     payment_method: str
@@ -108,7 +375,26 @@ class Wishlist(BaseModel):
     user_id: str
     product_ids: List[str] = []
 
+# Exact stock stays out of catalog reads, which are cached per catalog version
+PRODUCT_PROJECTION = {"_id": 0, **{field: 1 for field in Product.model_fields if field != "stock"}}
+ORDER_PROJECTION = {"_id": 0, **{field: 1 for field in Order.model_fields}}
+
+async def backfill_derived_fields():
+    # Products written before a derived field existed; cheap once none are left
+    for field, expression in Product.derived_fields.items():
+        result = await db.products.update_many({field: {"$exists": False}}, [{"$set": {field: expression}}])
+        if result.modified_count:
+            logger.info("Backfilled %s on %d products", field, result.modified_count)
+            await bump_catalog_version()
+
 # Helper functions
+def encode_json(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return encode_json(content)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=7)
@@ -123,40 +409,266 @@ def verify_token(token: str):
     except:
         return None
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    payload = verify_token(token)
-    if not payload:
+async def hash_password(password: str):
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many authentication requests, try again shortly")
+
+async def verify_password(password: str, hashed: str):
+    try:
+        return await password_hasher.verify_and_update(password, hashed)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many authentication requests, try again shortly")
+
+def client_ip(request: Request):
+    forwarded = request.headers.get('x-forwarded-for')
+    if forwarded and TRUSTED_PROXY_HOPS:
+        # Entries left of those added by our own proxies are client-controlled
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+    return request.client.host if request.client else None
+
+async def limit_attempts(*checks):
+    if not RATE_LIMIT_ENABLED:
+        return
+    try:
+        await rate_limiter.hit(db, checks)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+def get_token_subject(credentials: HTTPAuthorizationCredentials):
+    payload = verify_token(credentials.credentials)
+    if not payload or not payload.get("sub"):
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = await db.users.find_one({"id": payload.get("sub")}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
+    return payload["sub"]
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user_id = get_token_subject(credentials)
+    user = principal_cache.get(user_id)
+    if user is None:
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if not user_doc:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = User(**user_doc)
+        principal_cache.set(user_id, user)
+    return user
+
+async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        return get_token_subject(credentials)
+    user = await get_current_user(credentials)
+    return user.id
+
+def invalidate_principal(user_id: str):
+    principal_cache.pop(user_id)
+
+# Catalog version: a counter in Mongo bumped by every catalog write, polled by each
+# worker at most once per CATALOG_VERSION_POLL_INTERVAL so that writes made by
+# another worker invalidate this worker's cache as well.
+async def get_catalog_version():
+    now = time.monotonic()
+    if catalog_state['version'] is None or now - catalog_state['checked_at'] >= CATALOG_VERSION_POLL_INTERVAL:
+        doc = await db.counters.find_one({"_id": "catalog_version"})
+        version = doc['value'] if doc else 0
+        if version != catalog_state['version']:
+            catalog_cache.clear()
+        catalog_state['version'] = version
+        catalog_state['checked_at'] = now
+    return catalog_state['version']
+
+async def bump_catalog_version():
+    doc = await db.counters.find_one_and_update(
+        {"_id": "catalog_version"},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    catalog_cache.clear()
+    catalog_state['version'] = doc['value']
+    catalog_state['checked_at'] = time.monotonic()
+    return doc['value']
+
+def cache_catalog(key, value, version):
+    # Results read while a write was bumping the version are not cached
+    if catalog_state['version'] == version:
+        catalog_cache.set(key, value)
+
+def catalog_etag(request: Request, version):
+    canonical = request.url.path + "?" + "&".join(
+        f"{key}={value}" for key, value in sorted(request.query_params.multi_items())
+    )
+    digest = hashlib.sha1(canonical.encode()).hexdigest()[:16]
+    return f'"c{version}-{digest}"'
+
+def matching_etag(request: Request, etag: str):
+    # If-None-Match uses the weak comparison function. A tag of a compressed
+    # variant matches only while the client would still get that encoding.
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return None
+    encoding = choose_encoding(request.headers.get('accept-encoding', ''))
+    for tag in if_none_match.split(','):
+        if tag.strip() == '*':
+            return etag
+        base, tag_encoding = split_etag(tag)
+        if base == etag and tag_encoding in (None, encoding):
+            return encoded_etag(etag, tag_encoding) if tag_encoding else etag
+    return None
+
+def not_modified(request: Request, headers: dict):
+    # The 304 carries the tag of the variant the client holds, keyed like the 200
+    etag = matching_etag(request, headers['ETag'])
+    if etag is None:
+        return None
+    return Response(status_code=304, headers={**headers, "ETag": etag, "Vary": "Accept-Encoding"})
+
+def catalog_headers(request: Request, version):
+    return {"ETag": catalog_etag(request, version), "Cache-Control": CATALOG_CACHE_CONTROL}
+
+def catalog_response(request: Request, content, headers: dict, response: Response):
+    if SERIALIZE_TRUSTED_DOCUMENTS:
+        # content is a pre-encoded JSON Payload; the compression middleware
+        # leaves responses that already carry a Content-Encoding alone
+        encoding = len(content) >= COMPRESSION_MIN_SIZE and choose_encoding(request.headers.get('accept-encoding', ''))
+        if encoding:
+            headers = {**headers, "ETag": encoded_etag(headers['ETag'], encoding), "Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            return Response(content=content.encoded(encoding), media_type="application/json", headers=headers)
+        return Response(content=content.body, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return content
+
+def page_response(items: list, next_cursor, response: Response):
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    if SERIALIZE_TRUSTED_DOCUMENTS:
+        return FastJSONResponse(items, headers=headers)
+    response.headers.update(headers)
+    return items
+
+# Search index helpers
+SEARCH_PROJECTION = {
+    "_id": 0, "images": 1,
+    **{field: 1 for field in (*FIELD_WEIGHTS, *SUGGEST_FIELDS, *SUMMARY_FIELDS)}
+}
+
+# A rebuild (another worker's write, an import) builds fresh indexes in a
+# thread and swaps them in; until then requests keep using the previous ones,
+# and only the very first build is waited for.
+async def ensure_search_index():
+    version = await get_catalog_version()
+    if search_state['version'] == version:
+        return
+    rebuild = search_state['rebuild']
+    if rebuild is None or rebuild.done():
+        rebuild = search_state['rebuild'] = asyncio.create_task(rebuild_search_indexes(version))
+        # Failures are logged; stop asyncio reporting them a second time
+        rebuild.add_done_callback(lambda task: task.cancelled() or task.exception())
+    if search_state['version'] is None:
+        await asyncio.shield(rebuild)
+
+def build_search_indexes(products):
+    new_search_index, new_suggest_index = SearchIndex(), SuggestIndex()
+    new_search_index.build(products)
+    new_suggest_index.build(products)
+    return new_search_index, new_suggest_index
+
+async def rebuild_search_indexes(version):
+    global search_index, suggest_index
+    try:
+        products = await db.products.find({}, SEARCH_PROJECTION).to_list(None)
+        built = await asyncio.to_thread(build_search_indexes, products)
+    except Exception:
+        logger.exception("Rebuilding the search indexes failed")
+        raise
+    # Local writes applied to the old indexes meanwhile may be missing from the
+    # snapshot; recording the snapshot's version makes the next search rebuild.
+    search_index, suggest_index = built
+    search_state['version'] = version
+
+def update_search_index(version, products=(), removed_ids=()):
+    # Apply a local write incrementally; if another worker's write slipped in
+    # between, leave the index stale so the next search rebuilds it.
+    if search_state['version'] != version - 1:
+        return
+    for product_id in removed_ids:
+        search_index.remove(product_id)
+        suggest_index.remove(product_id)
+    for product_doc in products:
+        search_index.add(product_doc)
+        suggest_index.add(product_doc)
+    search_state['version'] = version
+
+async def search_filter(search: str, ranked: bool = True):
+    # Relevance order is bounded to SEARCH_MAX_RESULTS; used as a filter (for
+    # another sort order or for facet counts) the search matches everything.
+    if SEARCH_BACKEND == 'mongo':
+        return {"$text": {"$search": search}}, None
+    await ensure_search_index()
+    if not ranked:
+        return {"id": {"$in": list(search_index.matching(search))}}, None
+    ranked_ids = [doc_id for doc_id, _ in search_index.search(search, limit=SEARCH_MAX_RESULTS)]
+    return {"id": {"$in": ranked_ids}}, ranked_ids
+
+async def search_products(query: dict, search: str, skip: int, limit: int):
+    # Relevance-ordered page of search results
+    if SEARCH_BACKEND == 'mongo':
+        query['$text'] = {"$search": search}
+        products = await db.products.find(
+            query, {**PRODUCT_PROJECTION, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"}), ("id", 1)]).skip(skip).limit(limit).to_list(limit)
+        for product in products:
+            product.pop('score', None)
+        return products
+
+    text_query, ranked = await search_filter(search)
+    if not ranked:
+        return []
+    query.update(text_query)
+    products = await db.products.find(query, PRODUCT_PROJECTION).to_list(None)
+    position = {doc_id: i for i, doc_id in enumerate(ranked)}
+    products.sort(key=lambda product: position[product['id']])
+    return products[skip:skip + limit]
 
 # Auth routes
 @api_router.post("/auth/register")
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, request: Request):
+    await limit_attempts(("register_ip", client_ip(request)), ("register_email", user_data.email.lower()))
     existing = await db.users.find_one({"email": user_data.email})
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = pwd_context.hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     user = User(email=user_data.email, name=user_data.name, phone=user_data.phone)
     
     user_doc = user.model_dump()
     user_doc['password'] = hashed_password
-    user_doc['created_at'] = user_doc['created_at'].isoformat()
     
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     token = create_access_token({"sub": user.id})
     return {"token": token, "user": user}
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, request: Request):
+    await limit_attempts(("login_ip", client_ip(request)), ("login_email", credentials.email.lower()))
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not pwd_context.verify(credentials.password, user['password']):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    verified, new_hash = await verify_password(credentials.password, user['password'])
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS setting
+        await db.users.update_one({"id": user['id']}, {"$set": {"password": new_hash}})
     
     token = create_access_token({"sub": user['id']})
     user_obj = User(**{k: v for k, v in user.items() if k != 'password'})
@@ -166,221 +678,883 @@ async def login(credentials: UserLogin):
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@api_router.put("/auth/me", response_model=User)
+async def update_me(user_update: UserUpdate, current_user: User = Depends(get_current_user)):
+    changes = user_update.model_dump(exclude_unset=True)
+    if not changes:
+        return current_user
+    user_doc = await db.users.find_one_and_update(
+        {"id": current_user.id},
+        {"$set": changes},
+        projection={"_id": 0, "password": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_principal(current_user.id)
+    if not user_doc:
+        raise HTTPException(status_code=404, detail="User not found")
+    return User(**user_doc)
+
 # Product routes
 @api_router.get("/products", response_model=List[Product])
-async def get_products(category: Optional[str] = None, concern: Optional[str] = None, search: Optional[str] = None):
+async def get_products(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    concern: Optional[str] = None,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    version = await get_catalog_version()
+    headers = catalog_headers(request, version)
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    content, next_cursor = await product_page(category, concern, search, sort, limit, cursor, version)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return catalog_response(request, content, headers, response)
+
+async def product_page(category, concern, search, sort, limit, cursor, version):
+    key = ("products", category, concern, search, sort, limit, cursor)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        products, next_cursor = await query_products(category, concern, search, sort, limit, cursor)
+        cached = (Payload(encode_json(products)) if SERIALIZE_TRUSTED_DOCUMENTS else products, next_cursor)
+        cache_catalog(key, cached, version)
+    return cached
+
+async def query_products(category, concern, search, sort, limit, cursor):
     query = {}
     if category:
         query['category'] = category
     if concern:
         query['concern'] = concern
+
+    if search and not sort:
+        # Relevance order has no stable sort key, so its cursor is an offset
+        # into the (bounded) ranked result list.
+        skip = decode_cursor(cursor)[0] if cursor else 0
+        if not isinstance(skip, int) or skip < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        products = await search_products(query, search, skip, limit + 1)
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            next_cursor = encode_cursor([skip + limit])
+    else:
+        field, direction = parse_sort(sort, PRODUCT_SORT_FIELDS, "created_at")
+        if search:
+            text_query, _ = await search_filter(search, ranked=False)
+            query.update(text_query)
+        products, next_cursor = await paginate(db.products, query, field, direction, limit, cursor, PRODUCT_PROJECTION)
+
+    return products, next_cursor
+
+@api_router.get("/products/suggest")
+async def suggest_products(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(SUGGEST_DEFAULT_LIMIT, ge=1, le=SUGGEST_MAX_LIMIT)
+):
+    # Called on every keystroke: answered from the prefix index, never from Mongo
+    version = await get_catalog_version()
+    headers = catalog_headers(request, version)
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    await ensure_search_index()
+    suggestions = suggest_index.suggest(q, limit)
+    if SERIALIZE_TRUSTED_DOCUMENTS:
+        return FastJSONResponse(suggestions, headers=headers)
+    response.headers.update(headers)
+    return suggestions
+
+@api_router.get("/products/facets")
+async def get_product_facets(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    concern: Optional[str] = None,
+    search: Optional[str] = None
+):
+    key = ("facets", category, concern, search)
+    version = await get_catalog_version()
+    headers = catalog_headers(request, version)
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    facets = catalog_cache.get(key)
+    if facets is None:
+        facets = await query_facets(category, concern, search)
+        cache_catalog(key, facets, version)
+    response.headers.update(headers)
+    return facets
+
+def facet_counts(field: str):
+    return [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$project": {"_id": 0, "value": "$_id", "count": 1}},
+    ]
+
+async def query_facets(category, concern, search):
+    # One $facet aggregation. Each facet applies every active filter except its
+    # own, so the counts show what selecting another value would return.
+    base = {}
     if search:
-        query['$or'] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
-    
-    products = await db.products.find(query, {"_id": 0}).to_list(1000)
-    for product in products:
-        if isinstance(product.get('created_at'), str):
-            product['created_at'] = datetime.fromisoformat(product['created_at'])
-    return products
+        base, _ = await search_filter(search, ranked=False)
+    filters = {"category": category, "concern": concern}
+    def other_filters(field=None):
+        return {"$match": {name: value for name, value in filters.items() if value and name != field}}
+
+    pipeline = [
+        {"$match": base},
+        {"$facet": {
+            "total": [other_filters(), {"$count": "count"}],
+            "category": [other_filters("category"), *facet_counts("category")],
+            "concern": [other_filters("concern"), *facet_counts("concern")],
+            "price": [other_filters(), {"$bucket": {
+                "groupBy": {"$ifNull": ["$offer_price", "$price"]},
+                "boundaries": PRICE_BANDS,
+                "default": "above",
+                "output": {"count": {"$sum": 1}},
+            }}],
+            "in_stock": [other_filters(), *facet_counts("in_stock")],
+        }},
+    ]
+    result = (await db.products.aggregate(pipeline).to_list(1))[0]
+    bands = {band['_id']: band['count'] for band in result['price']}
+    uppers = PRICE_BANDS[1:] + [None]
+    return {
+        "total": result['total'][0]['count'] if result['total'] else 0,
+        "category": result['category'],
+        "concern": [facet for facet in result['concern'] if facet['value'] is not None],
+        "price": [
+            {"min": lower, "max": upper, "count": bands.get(lower if upper is not None else "above", 0)}
+            for lower, upper in zip(PRICE_BANDS, uppers)
+        ],
+        "in_stock": result['in_stock'],
+    }
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if isinstance(product.get('created_at'), str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    return Product(**product)
+async def get_product(product_id: str, request: Request, response: Response):
+    version = await get_catalog_version()
+    headers = catalog_headers(request, version)
+    unchanged = not_modified(request, headers)
+    if unchanged is not None:
+        return unchanged
+    if SERIALIZE_TRUSTED_DOCUMENTS:
+        content = catalog_cache.get(("product_json", product_id))
+        if content is None:
+            content = Payload(encode_json(await load_product(product_id, version)))
+            cache_catalog(("product_json", product_id), content, version)
+    else:
+        content = await load_product(product_id, version)
+    return catalog_response(request, content, headers, response)
+
+async def load_product(product_id: str, version):
+    key = ("product", product_id)
+    product = catalog_cache.get(key)
+    if product is None:
+        product = await db.products.find_one({"id": product_id}, PRODUCT_PROJECTION)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        cache_catalog(key, product, version)
+    return product
+
+@api_router.get("/products/{product_id}/recommendations", response_model=List[Product])
+async def get_product_recommendations(
+    product_id: str,
+    response: Response,
+    limit: int = Query(4, ge=1, le=RECOMMENDATIONS_TOP_N)
+):
+    related = (await get_related([product_id]))[product_id]
+    products = await recommended_products([item['product_id'] for item in related], limit)
+    return page_response(products, None, response)
+
+async def get_related(product_ids):
+    # Precomputed lists from the cache plus at most one $in query
+    found = {}
+    missing = []
+    for product_id in dict.fromkeys(product_ids):
+        related = recommendation_cache.get(product_id)
+        if related is None:
+            missing.append(product_id)
+        else:
+            found[product_id] = related
+    if missing:
+        for product_id, related in (await recommendations.related_lists(db, missing)).items():
+            recommendation_cache.set(product_id, related)
+            found[product_id] = related
+    return found
+
+async def recommended_products(product_ids: list, limit: int, exclude=()):
+    product_ids = [product_id for product_id in product_ids if product_id not in exclude]
+    products = await get_products_by_ids(product_ids)
+    available = [
+        products[product_id] for product_id in product_ids
+        if product_id in products and products[product_id].get('in_stock', True)
+    ]
+    return available[:limit]
+
+async def get_products_by_ids(product_ids):
+    # Resolve many products with the catalog cache plus at most one $in query
+    version = await get_catalog_version()
+    found = {}
+    missing = []
+    for product_id in dict.fromkeys(product_ids):
+        product = catalog_cache.get(("product", product_id))
+        if product is None:
+            missing.append(product_id)
+        else:
+            found[product_id] = product
+    if missing:
+        products = await db.products.find({"id": {"$in": missing}}, PRODUCT_PROJECTION).to_list(None)
+        for product in products:
+            found[product['id']] = product
+            cache_catalog(("product", product['id']), product, version)
+    return found
+
+def unit_price(product: dict):
+    return product['offer_price'] if product.get('offer_price') is not None else product['price']
 
 # Cart routes
 @api_router.get("/cart")
-async def get_cart(current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id}, {"_id": 0})
+async def get_cart(hydrate: bool = False, drop_missing: bool = False, user_id: str = Depends(get_current_user_id)):
+    cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0})
     if not cart:
-        return {"items": []}
+        cart = {"items": []}
+    if hydrate:
+        return await hydrate_cart(cart, drop_missing)
     return cart
 
+async def hydrate_cart(cart: dict, drop_missing: bool):
+    items = cart.get('items', [])
+    products = await get_products_by_ids([item['product_id'] for item in items])
+    hydrated = []
+    missing_product_ids = []
+    subtotal = 0.0
+    for item in items:
+        product = products.get(item['product_id'])
+        if product is None:
+            missing_product_ids.append(item['product_id'])
+            if not drop_missing:
+                hydrated.append({**item, "product": None, "unit_price": None, "line_total": 0.0, "available": False})
+            continue
+        price = unit_price(product)
+        line_total = round(price * item['quantity'], 2)
+        available = product.get('in_stock', True)
+        if available:
+            subtotal += line_total
+        hydrated.append({**item, "product": product, "unit_price": price, "line_total": line_total, "available": available})
+    return {
+        **cart,
+        "items": hydrated,
+        "item_count": sum(item['quantity'] for item in hydrated if item['available']),
+        "subtotal": round(subtotal, 2),
+        "missing_product_ids": missing_product_ids
+    }
+
+# Cart mutations are expressed as one aggregation-pipeline update, so every
+# change (or batch of changes) is a single atomic round trip on the cart document.
+def cart_item_stage(product_id: str, quantity: int, mode: str, add_missing: bool = True):
+    new_line = {"$literal": [{"product_id": product_id, "quantity": quantity}]}
+    product_id = {"$literal": product_id}
+    items = {"$ifNull": ["$items", []]}
+    # Repeated adds stop at the line limit instead of producing an unorderable cart
+    new_quantity = {"$min": [{"$add": ["$$item.quantity", quantity]}, MAX_LINE_QUANTITY]} if mode == "add" else quantity
+    return {"$set": {"items": {"$cond": [
+        {"$in": [product_id, {"$map": {"input": items, "as": "item", "in": "$$item.product_id"}}]},
+        {"$map": {"input": items, "as": "item", "in": {"$cond": [
+            {"$eq": ["$$item.product_id", product_id]},
+            {"product_id": "$$item.product_id", "quantity": new_quantity},
+            "$$item"
+        ]}}},
+        {"$concatArrays": [items, new_line]} if add_missing else items
+    ]}}}
+
+async def apply_cart_changes(user_id: str, changes: List[CartBatchItem], existing_only: bool = False):
+    # existing_only: change lines already in an existing cart, never add a line or create the cart
+    pipeline = [
+        cart_item_stage(change.product_id, change.quantity, change.mode, add_missing=not existing_only)
+        for change in changes
+    ]
+    pipeline.append({"$set": {
+        "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+        "items": {"$filter": {"input": "$items", "as": "item", "cond": {"$gt": ["$$item.quantity", 0]}}},
+        "updated_at": datetime.now(timezone.utc)
+    }})
+    try:
+        return await db.carts.update_one({"user_id": user_id}, pipeline, upsert=not existing_only)
+    except DuplicateKeyError:
+        # A concurrent request created the cart first; the document exists now
+        return await db.carts.update_one({"user_id": user_id}, pipeline)
+
+@api_router.get("/cart/recommendations", response_model=List[Product])
+async def get_cart_recommendations(
+    response: Response,
+    limit: int = Query(4, ge=1, le=RECOMMENDATIONS_TOP_N),
+    user_id: str = Depends(get_current_user_id)
+):
+    # Products bought together with anything in the cart, by summed co-purchase count
+    cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0, "items.product_id": 1})
+    in_cart = [item['product_id'] for item in (cart or {}).get('items', [])]
+    scores = {}
+    for related in (await get_related(in_cart)).values():
+        for item in related:
+            scores[item['product_id']] = scores.get(item['product_id'], 0) + item['count']
+    ranked = sorted(scores, key=lambda product_id: (-scores[product_id], product_id))
+    products = await recommended_products(ranked, limit, exclude=set(in_cart))
+    return page_response(products, None, response)
+
 @api_router.post("/cart")
-async def add_to_cart(item: CartItem, current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id})
-    
-    if not cart:
-        cart = Cart(user_id=current_user.id, items=[item])
-        cart_doc = cart.model_dump()
-        cart_doc['updated_at'] = cart_doc['updated_at'].isoformat()
-        await db.carts.insert_one(cart_doc)
-    else:
-        items = cart.get('items', [])
-        found = False
-        for i, existing_item in enumerate(items):
-            if existing_item['product_id'] == item.product_id:
-                items[i]['quantity'] += item.quantity
-                found = True
-                break
-        if not found:
-            items.append(item.model_dump())
-        
-        await db.carts.update_one(
-            {"user_id": current_user.id},
-            {"$set": {"items": items, "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
-    
+async def add_to_cart(item: CartItem, user_id: str = Depends(get_current_user_id)):
+    await apply_cart_changes(user_id, [CartBatchItem(product_id=item.product_id, quantity=item.quantity)])
     return {"message": "Item added to cart"}
 
+@api_router.post("/cart/batch")
+async def update_cart_batch(batch: CartBatch, user_id: str = Depends(get_current_user_id)):
+    await apply_cart_changes(user_id, batch.items)
+    return {"message": "Cart updated", "applied": len(batch.items)}
+
 @api_router.put("/cart/{product_id}")
-async def update_cart_item(product_id: str, quantity: int, current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id})
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    
-    items = cart.get('items', [])
-    for i, item in enumerate(items):
-        if item['product_id'] == product_id:
-            if quantity <= 0:
-                items.pop(i)
-            else:
-                items[i]['quantity'] = quantity
-            break
-    
-    await db.carts.update_one(
-        {"user_id": current_user.id},
-        {"$set": {"items": items, "updated_at": datetime.now(timezone.utc).isoformat()}}
+async def update_cart_item(product_id: str, quantity: int = Query(..., le=MAX_LINE_QUANTITY), user_id: str = Depends(get_current_user_id)):
+    result = await apply_cart_changes(
+        user_id, [CartBatchItem(product_id=product_id, quantity=quantity, mode="set")], existing_only=True
     )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Cart not found")
     return {"message": "Cart updated"}
 
 @api_router.delete("/cart/{product_id}")
-async def remove_from_cart(product_id: str, current_user: User = Depends(get_current_user)):
+async def remove_from_cart(product_id: str, user_id: str = Depends(get_current_user_id)):
     await db.carts.update_one(
-        {"user_id": current_user.id},
+        {"user_id": user_id},
         {"$pull": {"items": {"product_id": product_id}}}
     )
     return {"message": "Item removed"}
 
 # Wishlist routes
 @api_router.get("/wishlist")
-async def get_wishlist(current_user: User = Depends(get_current_user)):
-    wishlist = await db.wishlists.find_one({"user_id": current_user.id}, {"_id": 0})
+async def get_wishlist(hydrate: bool = False, drop_missing: bool = False, user_id: str = Depends(get_current_user_id)):
+    wishlist = await db.wishlists.find_one({"user_id": user_id}, {"_id": 0})
     if not wishlist:
-        return {"product_ids": []}
-    return wishlist
+        wishlist = {"product_ids": []}
+    if not hydrate:
+        return wishlist
+
+    products = await get_products_by_ids(wishlist['product_ids'])
+    missing_product_ids = [product_id for product_id in wishlist['product_ids'] if product_id not in products]
+    product_ids = [product_id for product_id in wishlist['product_ids'] if product_id in products] if drop_missing else wishlist['product_ids']
+    return {
+        **wishlist,
+        "product_ids": product_ids,
+        "products": [products[product_id] for product_id in wishlist['product_ids'] if product_id in products],
+        "missing_product_ids": missing_product_ids
+    }
 
 @api_router.post("/wishlist/{product_id}")
-async def add_to_wishlist(product_id: str, current_user: User = Depends(get_current_user)):
-    wishlist = await db.wishlists.find_one({"user_id": current_user.id})
+async def add_to_wishlist(product_id: str, user_id: str = Depends(get_current_user_id)):
+    wishlist = await db.wishlists.find_one({"user_id": user_id})
     
     if not wishlist:
-        wishlist = Wishlist(user_id=current_user.id, product_ids=[product_id])
+        wishlist = Wishlist(user_id=user_id, product_ids=[product_id])
         await db.wishlists.insert_one(wishlist.model_dump())
     else:
         await db.wishlists.update_one(
-            {"user_id": current_user.id},
+            {"user_id": user_id},
             {"$addToSet": {"product_ids": product_id}}
         )
     
     return {"message": "Added to wishlist"}
 
 @api_router.delete("/wishlist/{product_id}")
-async def remove_from_wishlist(product_id: str, current_user: User = Depends(get_current_user)):
+async def remove_from_wishlist(product_id: str, user_id: str = Depends(get_current_user_id)):
     await db.wishlists.update_one(
-        {"user_id": current_user.id},
+        {"user_id": user_id},
         {"$pull": {"product_ids": product_id}}
     )
     return {"message": "Removed from wishlist"}
 
 # Address routes
 @api_router.get("/addresses", response_model=List[Address])
-async def get_addresses(current_user: User = Depends(get_current_user)):
-    addresses = await db.addresses.find({"user_id": current_user.id}, {"_id": 0}).to_list(100)
+async def get_addresses(user_id: str = Depends(get_current_user_id)):
+    addresses = await db.addresses.find({"user_id": user_id}, {"_id": 0}).to_list(100)
     return addresses
 
 @api_router.post("/addresses", response_model=Address)
-async def create_address(address: Address, current_user: User = Depends(get_current_user)):
-    address.user_id = current_user.id
+async def create_address(address: Address, user_id: str = Depends(get_current_user_id)):
+    address.user_id = user_id
     await db.addresses.insert_one(address.model_dump())
     return address
 
 @api_router.delete("/addresses/{address_id}")
-async def delete_address(address_id: str, current_user: User = Depends(get_current_user)):
-    await db.addresses.delete_one({"id": address_id, "user_id": current_user.id})
+async def delete_address(address_id: str, user_id: str = Depends(get_current_user_id)):
+    await db.addresses.delete_one({"id": address_id, "user_id": user_id})
     return {"message": "Address deleted"}
 
 # Order routes
+# Stock is only tracked for products with a numeric `stock`. A reservation is a
+# conditional decrement that also tags the product with the order id, so after
+# the single bulk_write the applied lines (to release on failure) and products
+# that just sold out (which change listings) can be read back in one query.
+# Each decrement appends {order_id, quantity, at} to the product's
+# `reservations` in the same atomic update, so concurrent orders cannot hide
+# each other's reservations. Once the order is written the entry is settled
+# (removed) outside the order's transaction, keeping the hot product documents
+# out of it; if it is not written the stock is given back, which happens only
+# once. Entries left behind by a crash in between are reaped after
+# RESERVATION_TIMEOUT seconds.
+async def reserve_stock(order_id: str, quantities: dict):
+    # Exact stock is not part of the cached catalog documents
+    tracked_products = await db.products.find(
+        {"id": {"$in": list(quantities)}, "stock": {"$ne": None}}, {"_id": 0, "id": 1}
+    ).to_list(None)
+    tracked = {product['id']: quantities[product['id']] for product in tracked_products}
+    if not tracked:
+        return {}, False
+    entry = {"order_id": order_id, "at": datetime.now(timezone.utc)}
+    result = await db.products.bulk_write([
+        UpdateOne({"id": product_id, "stock": {"$gte": quantity}}, [
+            {"$set": {
+                "stock": {"$subtract": ["$stock", quantity]},
+                "reservations": {"$concatArrays": [
+                    {"$ifNull": ["$reservations", []]}, {"$literal": [{**entry, "quantity": quantity}]}
+                ]},
+            }},
+            {"$set": {"in_stock": {"$and": ["$in_stock", {"$gt": ["$stock", 0]}]}}},
+        ])
+        for product_id, quantity in tracked.items()
+    ], ordered=False)
+    applied = await db.products.find(
+        {"id": {"$in": list(tracked)}, "reservations.order_id": order_id}, {"_id": 0, "id": 1, "in_stock": 1}
+    ).to_list(None)
+    reserved = {product['id']: tracked[product['id']] for product in applied}
+    sold_out = any(not product['in_stock'] for product in applied)
+    if result.matched_count < len(tracked):
+        await release_stock(order_id, reserved)
+        if sold_out:
+            await catalog_changed()
+        short = [product_id for product_id in tracked if product_id not in reserved]
+        raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "product_ids": short})
+    return reserved, sold_out
+
+async def release_stock(order_id: str, reserved: dict):
+    if reserved:
+        await db.products.bulk_write([
+            UpdateOne({"id": product_id, "reservations.order_id": order_id}, [
+                {"$set": {
+                    "stock": {"$add": ["$stock", quantity]},
+                    "reservations": {"$filter": {
+                        "input": "$reservations", "cond": {"$ne": ["$$this.order_id", order_id]}
+                    }},
+                }},
+                {"$set": {"in_stock": {"$or": ["$in_stock", {"$gt": ["$stock", 0]}]}}},
+            ])
+            for product_id, quantity in reserved.items()
+        ], ordered=False)
+
+async def settle_stock(order_id: str, reserved):
+    # The order exists: its reservations become final
+    if reserved:
+        await db.products.update_many(
+            {"id": {"$in": list(reserved)}}, {"$pull": {"reservations": {"order_id": order_id}}}
+        )
+
+async def order_written(order_id: str) -> bool:
+    return await db.orders.count_documents({"id": order_id}, limit=1) > 0
+
+async def reap_reservations():
+    # Reservations older than RESERVATION_TIMEOUT belong to checkouts that died
+    # between reserve_stock and settling: settle them if the order was written,
+    # give the stock back otherwise.
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=RESERVATION_TIMEOUT)
+    products = await db.products.find(
+        {"reservations.at": {"$lt": cutoff}}, {"_id": 0, "id": 1, "reservations": 1}
+    ).to_list(None)
+    stale = {}
+    for product in products:
+        for entry in product['reservations']:
+            at = entry['at'] if entry['at'].tzinfo else entry['at'].replace(tzinfo=timezone.utc)
+            if at < cutoff:
+                stale.setdefault(entry['order_id'], {})[product['id']] = entry['quantity']
+    if not stale:
+        return {"settled": 0, "released": 0}
+    written = {order['id'] for order in await db.orders.find(
+        {"id": {"$in": list(stale)}}, {"_id": 0, "id": 1}
+    ).to_list(None)}
+    for order_id, reserved in stale.items():
+        if order_id in written:
+            await settle_stock(order_id, reserved)
+        else:
+            await release_stock(order_id, reserved)
+    if len(written) < len(stale):
+        await catalog_changed()
+    return {"settled": len(written), "released": len(stale) - len(written)}
+
+async def reservation_reaper():
+    while True:
+        try:
+            report = await reap_reservations()
+            if report['released']:
+                logger.warning("Released stock of %d abandoned checkouts", report['released'])
+        except Exception:
+            logger.exception("Reaping stock reservations failed")
+        await asyncio.sleep(RESERVATION_REAP_INTERVAL)
+
+async def catalog_changed():
+    version = await bump_catalog_version()
+    update_search_index(version)
+
+async def write_order(order_doc: dict, user_id: str, jobs: list):
+    # The order's follow-up jobs commit together with it
+    async def write(session=None):
+        await db.orders.insert_one(order_doc, session=session)
+        await db.carts.delete_one({"user_id": user_id}, session=session)
+        await db[OUTBOX].insert_many(jobs, session=session)
+
+    if transaction_state['enabled']:
+        async with await client.start_session() as session:
+            await session.with_transaction(write)
+    else:
+        await write()
+    job_queue.notify(*(job['_id'] for job in jobs))
+
+def rollup_snapshot(order: dict):
+    return {field: order.get(field) for field in ("created_at", "total_amount", "items", "payment_method", "order_status")}
+
+@job_queue.handler("record_order")
+async def record_order_job(database, payload: dict, session=None):
+    await analytics.record_order(database, payload['order'], session)
+
+@job_queue.handler("record_co_purchases")
+async def record_co_purchases_job(database, payload: dict, session=None):
+    await recommendations.record_basket(database, payload['product_ids'], RECOMMENDATIONS_TOP_N, session)
+    for product_id in payload['product_ids']:
+        recommendation_cache.pop(product_id)
+
+@job_queue.handler("record_status_change")
+async def record_status_change_job(database, payload: dict, session=None):
+    await analytics.record_status_change(
+        database, payload['order'], payload['old_status'], payload['new_status'], session
+    )
+
+def order_placed(order: dict):
+    return {"order_id": order['id'], "total_amount": order['total_amount'], "message": "Order placed successfully"}
+
+async def find_idempotent_order(user_id: str, idempotency_key: str):
+    return await db.orders.find_one(
+        {"user_id": user_id, "idempotency_key": idempotency_key}, {"_id": 0, "id": 1, "total_amount": 1}
+    )
+
 @api_router.post("/orders")
-async def create_order(order_data: dict, current_user: User = Depends(get_current_user)):
+async def create_order(
+    order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_KEY_HEADER, max_length=255),
+    user_id: str = Depends(get_current_user_id)
+):
+    # A retried checkout with the same key returns the order it already placed
+    if idempotency_key:
+        existing = await find_idempotent_order(user_id, idempotency_key)
+        if existing:
+            return order_placed(existing)
+
+    items = order_data.items
+    if items is None:
+        cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0, "items": 1})
+        cart_lines = (cart or {}).get('items', [])
+        # Carts written before the line limit existed may hold larger quantities
+        invalid = [line['product_id'] for line in cart_lines if not 1 <= line.get('quantity', 0) <= MAX_LINE_QUANTITY]
+        if invalid:
+            raise HTTPException(status_code=400, detail={
+                "message": f"Cart quantities must be between 1 and {MAX_LINE_QUANTITY}", "product_ids": invalid
+            })
+        items = [OrderLine.model_validate(line) for line in cart_lines]
+    quantities = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    if not quantities:
+        raise HTTPException(status_code=400, detail="No items to order")
+
+    products = await get_products_by_ids(list(quantities))
+    unavailable = [product_id for product_id in quantities if not products.get(product_id, {}).get('in_stock')]
+    if unavailable:
+        raise HTTPException(status_code=409, detail={"message": "Products unavailable", "product_ids": unavailable})
+
+    lines = [{
+        "product_id": product_id,
+        "product_name": products[product_id]['name'],
+        "category": products[product_id]['category'],
+        "quantity": quantity,
+        "price": unit_price(products[product_id])
+    } for product_id, quantity in quantities.items()]
+    subtotal = round(sum(line['price'] * line['quantity'] for line in lines), 2)
+    shipping = 0.0 if subtotal > FREE_SHIPPING_THRESHOLD else SHIPPING_FEE
     order = Order(
-        user_id=current_user.id,
-        items=order_data['items'],
-        total_amount=order_data['total_amount'],
-        address=order_data['address'],
-        payment_method=order_data['payment_method']
+        user_id=user_id,
+        items=lines,
+        subtotal=subtotal,
+        shipping=shipping,
+        total_amount=round(subtotal + shipping, 2),
+        address=order_data.address,
+        payment_method=order_data.payment_method,
+        # Mock payment success
+        payment_status="success" if order_data.payment_method == "online" else "pending"
     )
-    
     order_doc = order.model_dump()
-    order_doc['created_at'] = order_doc['created_at'].isoformat()
-    
-    # Mock payment success
-    if order_data['payment_method'] == 'online':
-        order_doc['payment_status'] = 'success'
-    elif order_data['payment_method'] == 'cod':
-        order_doc['payment_status'] = 'pending'
-    
-    await db.orders.insert_one(order_doc)
-    
-    # Clear cart
-    await db.carts.delete_one({"user_id": current_user.id})
-    
-    return {"order_id": order.id, "message": "Order placed successfully"}
+    if idempotency_key:
+        order_doc['idempotency_key'] = idempotency_key
+
+    jobs = [job_queue.new_job("record_order", {"order": rollup_snapshot(order_doc)})]
+    co_purchased = recommendations.basket(lines)
+    if len(co_purchased) >= 2:
+        jobs.append(job_queue.new_job("record_co_purchases", {"product_ids": co_purchased}))
+    reserved, sold_out = await reserve_stock(order.id, quantities)
+    try:
+        await write_order(order_doc, user_id, jobs)
+    except DuplicateKeyError:
+        # A concurrent retry with the same key placed the order first
+        await release_stock(order.id, reserved)
+        return order_placed(await find_idempotent_order(user_id, idempotency_key))
+    except BaseException:
+        # Without a transaction the order may be written even though a later
+        # write failed; its stock is then kept
+        if await order_written(order.id):
+            await settle_stock(order.id, reserved)
+        else:
+            await release_stock(order.id, reserved)
+        raise
+    finally:
+        if sold_out:
+            await catalog_changed()
+    try:
+        await settle_stock(order.id, reserved)
+    except Exception:
+        # The order stands; the reaper settles its reservations later
+        logger.exception("Settling the reservations of order %s failed", order.id)
+
+    return order_placed(order_doc)
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(current_user: User = Depends(get_current_user)):
-    orders = await db.orders.find({"user_id": current_user.id}, {"_id": 0}).to_list(100)
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-    return orders
+async def get_orders(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    orders, next_cursor = await paginate(
+        db.orders, {"user_id": user_id}, "created_at", -1, limit, cursor, ORDER_PROJECTION
+    )
+    return page_response(orders, next_cursor, response)
 
 # Admin routes
 @api_router.get("/admin/orders", response_model=List[Order])
-async def get_all_orders():
-    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-    return orders
+async def get_all_orders(
+    response: Response,
+    sort: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    field, direction = parse_sort(sort, ORDER_SORT_FIELDS, "-created_at")
+    orders, next_cursor = await paginate(db.orders, {}, field, direction, limit, cursor, ORDER_PROJECTION)
+    return page_response(orders, next_cursor, response)
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def order_export_row(order: dict):
+    items = order.get('items', [])
+    return [
+        order.get('id'),
+        json_default(order['created_at']) if isinstance(order.get('created_at'), datetime) else order.get('created_at'),
+        order.get('user_id'),
+        order.get('order_status'),
+        order.get('payment_method'),
+        order.get('payment_status'),
+        order.get('total_amount'),
+        sum(item.get('quantity', 1) for item in items),
+        json.dumps(items, default=json_default),
+        json.dumps(order.get('address', {}), default=json_default),
+    ]
+
+async def stream_orders(query: dict, export_format: str):
+    # Rows are flushed once per cursor batch (and right after the first one), so
+    # memory stays flat however many orders match and the first byte goes out
+    # as soon as Mongo answers.
+    cursor = db.orders.find(query, {"_id": 0}).sort([("created_at", 1), ("id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(ORDER_EXPORT_COLUMNS)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    rows = 0
+    async for order in cursor:
+        if export_format == "csv":
+            writer.writerow(order_export_row(order))
+        else:
+            buffer.write(json.dumps(order, default=json_default))
+            buffer.write("\n")
+        rows += 1
+        if rows == 1 or rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@api_router.get("/admin/orders/export")
+async def export_orders(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    order_status: Optional[str] = Query(None, alias="status")
+):
+    query = {}
+    if start or end:
+        query['created_at'] = {}
+        if start:
+            query['created_at']['$gte'] = start
+        if end:
+            query['created_at']['$lt'] = end
+    if order_status:
+        query['order_status'] = order_status
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    filename = f"orders-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.{export_format}"
+    return StreamingResponse(
+        stream_orders(query, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/admin/stats")
+async def get_stats():
+    return {
+        "catalog_cache": {**catalog_cache.stats(), "version": catalog_state['version']},
+        "principal_cache": {**principal_cache.stats(), "trust_token_claims": AUTH_TRUST_TOKEN_CLAIMS},
+        "password_hashing": password_hasher.stats(),
+        "search_index": {"backend": SEARCH_BACKEND, "documents": len(search_index), "terms": len(search_index.postings), "version": search_state['version']},
+        "suggest_index": {"documents": len(suggest_index), "words": len(suggest_index.words)},
+        "jobs": {**job_queue.stats(), "outbox": await job_queue.outbox_counts()},
+        "rate_limits": {**rate_limiter.stats(), "enabled": RATE_LIMIT_ENABLED},
+        "recommendation_cache": recommendation_cache.stats()
+    }
+
+metrics.add_stats("catalog_cache", catalog_cache.stats, counters=("hits", "misses", "evictions"))
+metrics.add_stats("principal_cache", principal_cache.stats, counters=("hits", "misses", "evictions"))
+metrics.add_stats("recommendation_cache", recommendation_cache.stats, counters=("hits", "misses", "evictions"))
+metrics.add_stats("password_hashing", password_hasher.stats, counters=("completed", "rejected"))
+metrics.add_stats("jobs", job_queue.stats, counters=("completed", "retried", "failed"))
+metrics.add_stats("rate_limit", rate_limiter.stats)
+metrics.add_stats("search_index", lambda: {"documents": len(search_index), "terms": len(search_index.postings)})
+metrics.add_stats("suggest_index", lambda: {"documents": len(suggest_index), "words": len(suggest_index.words)})
+
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Health routes
+@api_router.get("/health/live")
+async def liveness():
+    # The process is up and its event loop is serving requests
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def readiness(response: Response):
+    checks = {"started": lifecycle['ready'], "draining": lifecycle['draining'], "mongo": False}
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT)
+        checks['mongo'] = True
+    except Exception:
+        pass
+    ready = checks['started'] and checks['mongo'] and not checks['draining']
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "unavailable", "checks": checks}
 
 @api_router.put("/admin/orders/{order_id}/status")
 async def update_order_status(order_id: str, status_data: dict):
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {"order_status": status_data['status']}}
-    )
+    # The status change and its rollup job commit together, as in write_order
+    async def write(session=None):
+        previous = await db.orders.find_one_and_update(
+            {"id": order_id},
+            {"$set": {"order_status": status_data['status']}},
+            projection={"_id": 0, "created_at": 1, "order_status": 1, "total_amount": 1, "items": 1},
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if previous and previous.get('order_status') != status_data['status']:
+            return await job_queue.enqueue("record_status_change", {
+                "order": rollup_snapshot(previous),
+                "old_status": previous.get('order_status'),
+                "new_status": status_data['status']
+            }, session=session)
+
+    if transaction_state['enabled']:
+        async with await client.start_session() as session:
+            job_id = await session.with_transaction(write)
+        if job_id:
+            job_queue.notify(job_id)
+    else:
+        await write()
     return {"message": "Order status updated"}
 
+@api_router.get("/admin/analytics/sales")
+async def get_sales_analytics(
+    dimension: Literal["all", "category", "payment_method", "order_status"] = "all",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    return await analytics.query_rollups(db, dimension, start, end)
+
 @api_router.post("/admin/products", response_model=Product)
 async def create_product(product: Product):
     product_doc = product.model_dump()
-    product_doc['created_at'] = product_doc['created_at'].isoformat()
     await db.products.insert_one(product_doc)
+    version = await bump_catalog_version()
+    update_search_index(version, [product_doc])
     return product
 
+@api_router.post("/admin/products/import")
+async def import_products(
+    request: Request,
+    import_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    dry_run: bool = False,
+    chunk_size: int = Query(1000, ge=1, le=10000)
+):
+    # The request body is consumed as a stream, never buffered whole
+    rows = product_import.iter_rows(product_import.iter_lines(request.stream()), import_format)
+    report = await product_import.import_products(db, rows, Product, dry_run=dry_run, chunk_size=chunk_size)
+    if not dry_run and report['inserted'] + report['updated']:
+        # Changed products reach the search index through a rebuild on the next search
+        await bump_catalog_version()
+    return report
+
 @api_router.put("/admin/products/{product_id}", response_model=Product)
 async def update_product(product_id: str, product_data: dict):
     product = Product(id=product_id, **product_data)
     product_doc = product.model_dump()
-    product_doc['created_at'] = product_doc['created_at'].isoformat()
     
     await db.products.update_one(
         {"id": product_id},
         {"$set": product_doc}
     )
+    version = await bump_catalog_version()
+    update_search_index(version, [product_doc])
     return product
 
 @api_router.delete("/admin/products/{product_id}")
 async def delete_product(product_id: str):
     await db.products.delete_one({"id": product_id})
+    version = await bump_catalog_version()
+    update_search_index(version, removed_ids=[product_id])
     return {"message": "Product deleted"}
 
 # Initialize sample products
@@ -406,7 +1580,7 @@ async def init_products():
             "ingredients": "Vitamin C, Hyaluronic Acid, Niacinamide",
             "how_to_use": "Apply 2-3 drops on clean face, massage gently. Use morning and night.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -422,7 +1596,7 @@ async def init_products():
             "ingredients": "Hyaluronic Acid, Glycerin, Ceramides",
             "how_to_use": "Apply on damp skin after cleansing. Use twice daily.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -438,7 +1612,7 @@ async def init_products():
             "ingredients": "Tea Tree Oil, Salicylic Acid, Witch Hazel",
             "how_to_use": "Apply on affected areas after cleansing. Use at night.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -454,7 +1628,7 @@ async def init_products():
             "ingredients": "Retinol, Peptides, Vitamin E",
             "how_to_use": "Apply at night on clean skin. Use sunscreen during day.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         # Haircare
         {
@@ -471,7 +1645,7 @@ async def init_products():
             "ingredients": "Biotin, Keratin, Argan Oil",
             "how_to_use": "Apply on wet hair, massage, rinse thoroughly. Use 2-3 times weekly.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -487,7 +1661,7 @@ async def init_products():
             "ingredients": "Tea Tree Oil, Salicylic Acid, Menthol",
             "how_to_use": "Apply on scalp, massage for 2 minutes, rinse. Use regularly.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -503,7 +1677,7 @@ async def init_products():
             "ingredients": "Argan Oil, Vitamin E, Coconut Oil",
             "how_to_use": "Apply 2-3 drops on damp or dry hair. Style as usual.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -519,7 +1693,7 @@ async def init_products():
             "ingredients": "Shea Butter, Coconut Oil, Protein Complex",
             "how_to_use": "Apply on damp hair, leave for 15 minutes, rinse. Use weekly.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         # Body Care
         {
@@ -536,7 +1710,7 @@ async def init_products():
             "ingredients": "Coconut Oil, Shea Butter, Vitamin E",
             "how_to_use": "Apply on clean skin after shower. Massage gently.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -552,7 +1726,7 @@ async def init_products():
             "ingredients": "Vitamin E, Aloe Vera, Glycerin",
             "how_to_use": "Apply daily on body after bath.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -568,7 +1742,7 @@ async def init_products():
             "ingredients": "Coffee Grounds, Coconut Oil, Sugar",
             "how_to_use": "Apply on wet skin, scrub gently, rinse. Use 2-3 times weekly.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -584,11 +1758,15 @@ async def init_products():
             "ingredients": "Lavender Essential Oil, Epsom Salt, Sea Salt",
             "how_to_use": "Add to warm bath water. Soak for 20 minutes.",
             "in_stock": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
+    for product in sample_products:
+        product['effective_price'] = unit_price(product)
     await db.products.insert_many(sample_products)
+    version = await bump_catalog_version()
+    update_search_index(version, sample_products)
     return {"message": f"{len(sample_products)} products initialized"}
 
 app.include_router(api_router)
@@ -599,7 +1777,10 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+app.add_middleware(MetricsMiddleware, registry=metrics, slow_request_seconds=METRICS_SLOW_REQUEST_MS / 1000)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -607,6 +1788,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def warm_up():
+    started = time.perf_counter()
+    # Concurrent pings check out (and so open) that many pooled connections
+    await asyncio.gather(*(db.command("ping") for _ in range(MONGO_WARM_CONNECTIONS)))
+    version = await get_catalog_version()
+    await ensure_search_index()
+    # The default listing (GET /api/products) is what most first requests ask for
+    content, _ = await product_page(None, None, None, None, 100, None, version)
+    if isinstance(content, Payload):
+        for encoding in SUPPORTED_ENCODINGS:
+            content.encoded(encoding)
+    await password_hasher.warm_up()
+    logger.info("Warm-up finished in %.0f ms", 1000 * (time.perf_counter() - started))
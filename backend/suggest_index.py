@@ -0,0 +1,115 @@
+"""In-memory prefix index for search-as-you-type suggestions.
+
+Every word of a product's name, ingredients and concern is kept once in a
+sorted array; a query word matches the contiguous run of words it prefixes,
+found with two bisections. A product matches when every query word prefixes
+one of its words ("hyal cre" finds "Hyaluronic Acid Hydrating Cream"), and
+matches are ranked by rating, then review_count. Products are kept as small
+summaries, so suggestions are served without touching the database.
+"""
+import bisect
+import heapq
+
+from search_index import TOKEN_RE
+
+SUGGEST_FIELDS = ("name", "ingredients", "concern")
+SUMMARY_FIELDS = ("id", "name", "category", "price", "offer_price", "rating", "review_count")
+# One- and two-character prefixes match a large share of the catalog; their
+# rankings are memoized until the index next changes.
+MEMO_PREFIX_LENGTH = 2
+
+
+def words(text) -> set:
+    if not text:
+        return set()
+    return set(TOKEN_RE.findall(str(text).lower()))
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.words = []
+        self.postings = {}
+        self.doc_words = {}
+        self.docs = {}
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def build(self, products):
+        self.postings = {}
+        self.doc_words = {}
+        self.docs = {}
+        self._memo = {}
+        for product in products:
+            self._index(product)
+        self.words = sorted(self.postings)
+
+    def _index(self, product: dict) -> set:
+        doc_id = product['id']
+        doc_words = set()
+        for field in SUGGEST_FIELDS:
+            doc_words |= words(product.get(field))
+        new_words = set()
+        for word in doc_words:
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = set()
+                new_words.add(word)
+            postings.add(doc_id)
+        self.doc_words[doc_id] = doc_words
+        summary = {field: product.get(field) for field in SUMMARY_FIELDS}
+        images = product.get('images') or []
+        summary['image'] = images[0] if images else None
+        self.docs[doc_id] = summary
+        return new_words
+
+    def add(self, product: dict):
+        self.remove(product['id'])
+        self._memo.clear()
+        for word in self._index(product):
+            bisect.insort(self.words, word)
+
+    def remove(self, doc_id: str):
+        doc_words = self.doc_words.pop(doc_id, None)
+        if doc_words is None:
+            return
+        self._memo.clear()
+        self.docs.pop(doc_id, None)
+        for word in doc_words:
+            postings = self.postings[word]
+            postings.discard(doc_id)
+            if not postings:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+
+    def _prefixed(self, prefix: str) -> set:
+        start = bisect.bisect_left(self.words, prefix)
+        # Words are [a-z0-9]+, so every word with this prefix sorts before prefix + "{"
+        end = bisect.bisect_left(self.words, prefix + "{", start)
+        matches = set()
+        for word in self.words[start:end]:
+            matches |= self.postings[word]
+        return matches
+
+    def suggest(self, query: str, limit: int = 8) -> list:
+        # Rarest-looking (longest) prefix first keeps the intersection small
+        prefixes = sorted(words(query), key=len, reverse=True)
+        if not prefixes:
+            return []
+        memo_key = None
+        if len(prefixes) == 1 and len(prefixes[0]) <= MEMO_PREFIX_LENGTH:
+            memo_key = (prefixes[0], limit)
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+        matches = self._prefixed(prefixes[0])
+        for prefix in prefixes[1:]:
+            if not matches:
+                break
+            matches &= self._prefixed(prefix)
+        top = heapq.nlargest(limit, matches, key=lambda doc_id: (
+            self.docs[doc_id]['rating'] or 0, self.docs[doc_id]['review_count'] or 0, doc_id))
+        suggestions = [self.docs[doc_id] for doc_id in top]
+        if memo_key is not None:
+            self._memo[memo_key] = suggestions
+        return suggestions
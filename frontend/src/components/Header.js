@@ -1,25 +1,58 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { ShoppingCart, User, Search, Menu, X, Heart } from 'lucide-react';
+import axios from 'axios';
 import { useAuth } from '../App';
 import AuthModal from './AuthModal';
 import { toast } from 'sonner';
 
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const SUGGEST_DEBOUNCE_MS = 150;
+
 const Header = () => {
   const { user, logout, cartCount } = useAuth();
   const [showAuthModal, setShowAuthModal] = useState(false);
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const navigate = useNavigate();
 
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSuggestions([]);
+      return;
+    }
+    // Only the latest keystroke's answer is shown
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get(`${API}/products/suggest`, { params: { q: query } });
+        if (!cancelled) setSuggestions(response.data);
+      } catch (error) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, SUGGEST_DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
   const handleSearch = (e) => {
     e.preventDefault();
     if (searchQuery.trim()) {
-      navigate(`/products?search=${searchQuery}`);
+      navigate(`/products?search=${encodeURIComponent(searchQuery)}`);
       setSearchQuery('');
     }
   };
 
+  const handleSuggestionClick = (product) => {
+    navigate(`/products/${product.id}`);
+    setSearchQuery('');
+  };
+
   const handleLogout = () => {
     logout();
     toast.success('Logged out successfully');
@@ -58,6 +91,24 @@ const Header = () => {
                 <button type="submit" className="absolute right-3 top-1/2 -translate-y-1/2" data-testid="search-button">
                   <Search className="w-5 h-5 text-gray-400" />
                 </button>
+                {suggestions.length > 0 && (
+                  <ul className="absolute left-0 right-0 top-full mt-2 bg-white border border-gray-200 rounded-lg shadow-lg overflow-hidden" data-testid="search-suggestions">
+                    {suggestions.map((product) => (
+                      <li key={product.id}>
+                        <button
+                          type="button"
+                          onClick={() => handleSuggestionClick(product)}
+                          className="w-full flex items-center space-x-3 px-4 py-2 text-left hover:bg-amber-50"
+                          data-testid="search-suggestion"
+                        >
+                          {product.image && <img src={product.image} alt={product.name} className="w-10 h-10 object-cover rounded" />}
+                          <span className="flex-1 text-sm text-gray-700">{product.name}</span>
+                          <span className="text-sm font-semibold text-amber-900">₹{product.offer_price || product.price}</span>
+                        </button>
+                      </li>
+                    ))}
+                  </ul>
+                )}
               </div>
             </form>
 
@@ -35,12 +35,9 @@ const AccountPage = () => {
 
   const fetchWishlist = async () => {
     try {
-      const response = await axios.get(`${API}/wishlist`);
+      const response = await axios.get(`${API}/wishlist`, { params: { hydrate: true } });
       setWishlist(response.data.product_ids || []);
-
-      const productPromises = response.data.product_ids?.map(id => axios.get(`${API}/products/${id}`)) || [];
-      const productResponses = await Promise.all(productPromises);
-      setWishlistProducts(productResponses.map(res => res.data));
+      setWishlistProducts(response.data.products || []);
     } catch (error) {
       console.error('Failed to fetch wishlist');
     }
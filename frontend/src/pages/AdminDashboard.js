@@ -8,11 +8,25 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '../components/
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+
+// List endpoints return one page at a time; follow the cursor to the end
+const fetchAllPages = async (url, params = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await axios.get(url, { params: { ...params, limit: 500, ...(cursor && { cursor }) } });
+    items.push(...response.data);
+    cursor = response.headers[NEXT_CURSOR_HEADER];
+  } while (cursor);
+  return items;
+};
 
 const AdminDashboard = () => {
   const navigate = useNavigate();
   const [products, setProducts] = useState([]);
   const [orders, setOrders] = useState([]);
+  const [ordersCursor, setOrdersCursor] = useState(null);
   const [stats, setStats] = useState({ totalProducts: 0, totalOrders: 0, totalRevenue: 0 });
   const [showProductModal, setShowProductModal] = useState(false);
   const [editingProduct, setEditingProduct] = useState(null);
@@ -39,25 +53,38 @@ const AdminDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [productsRes, ordersRes] = await Promise.all([
-        axios.get(`${API}/products`),
-        axios.get(`${API}/admin/orders`).catch(() => ({ data: [] }))
+      const [allProducts, ordersRes, salesRes] = await Promise.all([
+        fetchAllPages(`${API}/products`),
+        axios.get(`${API}/admin/orders`).catch(() => ({ data: [], headers: {} })),
+        axios.get(`${API}/admin/analytics/sales`, { params: { dimension: 'all' } }).catch(() => ({ data: { totals: {} } }))
       ]);
       
-      setProducts(productsRes.data);
+      setProducts(allProducts);
       setOrders(ordersRes.data);
+      setOrdersCursor(ordersRes.headers[NEXT_CURSOR_HEADER] || null);
       
-      const revenue = ordersRes.data.reduce((sum, order) => sum + order.total_amount, 0);
+      // Order count and revenue come from the sales rollups, not from one page of orders
+      const sales = salesRes.data.totals.all || { orders: 0, revenue: 0 };
       setStats({
-        totalProducts: productsRes.data.length,
-        totalOrders: ordersRes.data.length,
-        totalRevenue: revenue
+        totalProducts: allProducts.length,
+        totalOrders: sales.orders,
+        totalRevenue: sales.revenue
       });
     } catch (error) {
       console.error('Failed to fetch data');
     }
   };
 
+  const loadMoreOrders = async () => {
+    try {
+      const response = await axios.get(`${API}/admin/orders`, { params: { cursor: ordersCursor } });
+      setOrders(prev => [...prev, ...response.data]);
+      setOrdersCursor(response.headers[NEXT_CURSOR_HEADER] || null);
+    } catch (error) {
+      toast.error('Failed to load more orders');
+    }
+  };
+
   const handleLogout = () => {
     localStorage.removeItem('admin_token');
     toast.success('Logged out');
@@ -323,6 +350,11 @@ const AdminDashboard = () => {
                       </div>
                     </div>
                   ))}
+                  {ordersCursor && (
+                    <button onClick={loadMoreOrders} className="w-full btn-secondary" data-testid="load-more-orders">
+                      Load More Orders
+                    </button>
+                  )}
                 </div>
               )}
             </div>
@@ -2,6 +2,7 @@ import { useEffect, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import Header from '../components/Header';
 import Footer from '../components/Footer';
+import ProductCard from '../components/ProductCard';
 import axios from 'axios';
 import { Trash2, Plus, Minus } from 'lucide-react';
 import { useAuth } from '../App';
@@ -9,11 +10,13 @@ import { toast } from 'sonner';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+// The backend rejects larger quantities per product line
+const MAX_LINE_QUANTITY = 100;
 
 const CartPage = () => {
   const { fetchCartCount } = useAuth();
   const [cart, setCart] = useState({ items: [] });
-  const [products, setProducts] = useState({});
+  const [recommendations, setRecommendations] = useState([]);
   const [loading, setLoading] = useState(true);
   const [couponCode, setCouponCode] = useState('');
   const navigate = useNavigate();
@@ -24,18 +27,17 @@ const CartPage = () => {
 
   const fetchCart = async () => {
     try {
-      const cartResponse = await axios.get(`${API}/cart`);
+      // Each line comes back with its product, unit price and line total
+      const cartResponse = await axios.get(`${API}/cart`, { params: { hydrate: true } });
       setCart(cartResponse.data);
 
-      const productIds = cartResponse.data.items?.map(item => item.product_id) || [];
-      const productPromises = productIds.map(id => axios.get(`${API}/products/${id}`));
-      const productResponses = await Promise.all(productPromises);
-
-      const productsMap = {};
-      productResponses.forEach(response => {
-        productsMap[response.data.id] = response.data;
-      });
-      setProducts(productsMap);
+      if (cartResponse.data.items.length > 0) {
+        const recommendationsResponse = await axios.get(`${API}/cart/recommendations`)
+          .catch(() => ({ data: [] }));
+        setRecommendations(recommendationsResponse.data);
+      } else {
+        setRecommendations([]);
+      }
     } catch (error) {
       console.error('Failed to fetch cart');
     } finally {
@@ -69,15 +71,6 @@ const CartPage = () => {
     }
   };
 
-  const calculateSubtotal = () => {
-    return cart.items?.reduce((sum, item) => {
-      const product = products[item.product_id];
-      if (!product) return sum;
-      const price = product.offer_price || product.price;
-      return sum + (price * item.quantity);
-    }, 0) || 0;
-  };
-
   const applyCoupon = () => {
     if (couponCode.toLowerCase() === 'save10') {
       toast.success('Coupon applied! 10% discount');
@@ -115,7 +108,7 @@ const CartPage = () => {
     );
   }
 
-  const subtotal = calculateSubtotal();
+  const subtotal = cart.subtotal || 0;
   const shipping = subtotal > 500 ? 0 : 50;
   const total = subtotal + shipping;
 
@@ -133,7 +126,7 @@ const CartPage = () => {
             {/* Cart Items */}
             <div className="lg:col-span-2 space-y-4">
               {cart.items.map((item) => {
-                const product = products[item.product_id];
+                const product = item.product;
                 if (!product) return null;
 
                 return (
@@ -175,7 +168,8 @@ const CartPage = () => {
                           <span className="font-medium" data-testid="item-quantity">{item.quantity}</span>
                           <button
                             onClick={() => updateQuantity(item.product_id, item.quantity + 1)}
-                            className="p-2 border border-gray-300 rounded-lg hover:bg-gray-100"
+                            disabled={item.quantity >= MAX_LINE_QUANTITY}
+                            className="p-2 border border-gray-300 rounded-lg hover:bg-gray-100 disabled:opacity-50"
                             data-testid="increase-qty"
                           >
                             <Plus className="w-4 h-4" />
@@ -184,7 +178,7 @@ const CartPage = () => {
 
                         <div className="flex items-center space-x-4">
                           <span className="text-xl font-bold text-amber-900" data-testid="item-price">
-                            ₹{(product.offer_price || product.price) * item.quantity}
+                            ₹{item.line_total}
                           </span>
                           <button
                             onClick={() => removeItem(item.product_id)}
@@ -261,6 +255,18 @@ const CartPage = () => {
               </div>
             </div>
           </div>
+
+          {/* Frequently Bought Together */}
+          {recommendations.length > 0 && (
+            <div className="mt-16" data-testid="cart-recommendations-section">
+              <h2 className="text-2xl sm:text-3xl font-bold text-amber-900 mb-8">Frequently Bought Together</h2>
+              <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6">
+                {recommendations.map((product) => (
+                  <ProductCard key={product.id} product={product} />
+                ))}
+              </div>
+            </div>
+          )}
         </div>
       </div>
 
@@ -14,12 +14,13 @@ const CheckoutPage = () => {
   const { user } = useAuth();
   const navigate = useNavigate();
   const [cart, setCart] = useState({ items: [] });
-  const [products, setProducts] = useState({});
   const [addresses, setAddresses] = useState([]);
   const [selectedAddress, setSelectedAddress] = useState(null);
   const [showAddressForm, setShowAddressForm] = useState(false);
   const [paymentMethod, setPaymentMethod] = useState('online');
   const [loading, setLoading] = useState(false);
+  // One key per checkout visit, so a retried submit cannot place a second order
+  const [idempotencyKey] = useState(() => `${Date.now()}-${Math.random().toString(36).slice(2)}`);
   const [addressForm, setAddressForm] = useState({
     name: user?.name || '',
     phone: user?.phone || '',
@@ -38,18 +39,9 @@ const CheckoutPage = () => {
 
   const fetchCart = async () => {
     try {
-      const cartResponse = await axios.get(`${API}/cart`);
+      // Each line comes back with its product, unit price and line total
+      const cartResponse = await axios.get(`${API}/cart`, { params: { hydrate: true } });
       setCart(cartResponse.data);
-
-      const productIds = cartResponse.data.items?.map(item => item.product_id) || [];
-      const productPromises = productIds.map(id => axios.get(`${API}/products/${id}`));
-      const productResponses = await Promise.all(productPromises);
-
-      const productsMap = {};
-      productResponses.forEach(response => {
-        productsMap[response.data.id] = response.data;
-      });
-      setProducts(productsMap);
     } catch (error) {
       console.error('Failed to fetch cart');
     }
@@ -80,15 +72,6 @@ const CheckoutPage = () => {
     }
   };
 
-  const calculateSubtotal = () => {
-    return cart.items?.reduce((sum, item) => {
-      const product = products[item.product_id];
-      if (!product) return sum;
-      const price = product.offer_price || product.price;
-      return sum + (price * item.quantity);
-    }, 0) || 0;
-  };
-
   const handlePlaceOrder = async () => {
     if (!selectedAddress) {
       toast.error('Please select a delivery address');
@@ -99,9 +82,9 @@ const CheckoutPage = () => {
     try {
       const orderItems = cart.items.map(item => ({
         product_id: item.product_id,
-        product_name: products[item.product_id]?.name,
+        product_name: item.product?.name,
         quantity: item.quantity,
-        price: products[item.product_id]?.offer_price || products[item.product_id]?.price
+        price: item.unit_price
       }));
 
       const response = await axios.post(`${API}/orders`, {
@@ -109,18 +92,20 @@ const CheckoutPage = () => {
         total_amount: total,
         address: selectedAddress,
         payment_method: paymentMethod
+      }, {
+        headers: { 'Idempotency-Key': idempotencyKey }
       });
 
       toast.success('Order placed successfully!');
       navigate(`/order-success/${response.data.order_id}`);
     } catch (error) {
-      toast.error('Failed to place order');
+      toast.error(error.response?.data?.detail?.message || 'Failed to place order');
     } finally {
       setLoading(false);
     }
   };
 
-  const subtotal = calculateSubtotal();
+  const subtotal = cart.subtotal || 0;
   const shipping = subtotal > 500 ? 0 : 50;
   const total = subtotal + shipping;
 
@@ -319,7 +304,7 @@ const CheckoutPage = () => {
                 {/* Items */}
                 <div className="space-y-3 mb-6 max-h-60 overflow-y-auto">
                   {cart.items.map((item) => {
-                    const product = products[item.product_id];
+                    const product = item.product;
                     if (!product) return null;
                     return (
                       <div key={item.product_id} className="flex justify-between text-sm" data-testid={`summary-item-${item.product_id}`}>
@@ -327,7 +312,7 @@ const CheckoutPage = () => {
                           {product.name} x {item.quantity}
                         </span>
                         <span className="font-semibold">
-                          ₹{(product.offer_price || product.price) * item.quantity}
+                          ₹{item.line_total}
                         </span>
                       </div>
                     );
@@ -11,12 +11,15 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '../components/ui/tabs'
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+// The backend rejects larger quantities per product line
+const MAX_LINE_QUANTITY = 100;
 
 const ProductDetailPage = () => {
   const { id } = useParams();
   const { user, fetchCartCount } = useAuth();
   const [product, setProduct] = useState(null);
   const [relatedProducts, setRelatedProducts] = useState([]);
+  const [boughtTogether, setBoughtTogether] = useState([]);
   const [quantity, setQuantity] = useState(1);
   const [loading, setLoading] = useState(true);
   const [isWishlisted, setIsWishlisted] = useState(false);
@@ -35,6 +38,10 @@ const ProductDetailPage = () => {
         params: { category: response.data.category }
       });
       setRelatedProducts(relatedResponse.data.filter(p => p.id !== id).slice(0, 4));
+
+      const recommendationsResponse = await axios.get(`${API}/products/${id}/recommendations`)
+        .catch(() => ({ data: [] }));
+      setBoughtTogether(recommendationsResponse.data);
     } catch (error) {
       toast.error('Product not found');
     } finally {
@@ -205,7 +212,7 @@ const ProductDetailPage = () => {
                       </button>
                       <span className="px-6 py-2 border-x" data-testid="quantity-value">{quantity}</span>
                       <button
-                        onClick={() => setQuantity(quantity + 1)}
+                        onClick={() => setQuantity(Math.min(MAX_LINE_QUANTITY, quantity + 1))}
                         className="px-4 py-2 hover:bg-gray-100"
                         data-testid="increase-quantity"
                       >
@@ -271,6 +278,18 @@ const ProductDetailPage = () => {
             </div>
           </div>
 
+          {/* Frequently Bought Together */}
+          {boughtTogether.length > 0 && (
+            <div className="mb-16" data-testid="bought-together-section">
+              <h2 className="text-2xl sm:text-3xl font-bold text-amber-900 mb-8">Frequently Bought Together</h2>
+              <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6">
+                {boughtTogether.map((product) => (
+                  <ProductCard key={product.id} product={product} />
+                ))}
+              </div>
+            </div>
+          )}
+
           {/* Related Products */}
           {relatedProducts.length > 0 && (
             <div data-testid="related-products-section">
@@ -8,10 +8,21 @@ import { SlidersHorizontal } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+// Sorting happens on the server so it holds across pages; price sorts follow
+// what the shopper pays (the offer price when there is one)
+const SORT_PARAMS = {
+  'price-low': 'effective_price',
+  'price-high': '-effective_price',
+  'rating': '-rating'
+};
 
 const ProductListPage = () => {
   const [products, setProducts] = useState([]);
+  const [totalProducts, setTotalProducts] = useState(0);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filters, setFilters] = useState({
     category: '',
     concern: '',
@@ -39,18 +50,15 @@ const ProductListPage = () => {
       if (filterParams.concern) params.concern = filterParams.concern;
       if (filterParams.search) params.search = filterParams.search;
 
-      const response = await axios.get(`${API}/products`, { params });
-      let sortedProducts = response.data;
-
-      if (filterParams.sort === 'price-low') {
-        sortedProducts.sort((a, b) => (a.offer_price || a.price) - (b.offer_price || b.price));
-      } else if (filterParams.sort === 'price-high') {
-        sortedProducts.sort((a, b) => (b.offer_price || b.price) - (a.offer_price || a.price));
-      } else if (filterParams.sort === 'rating') {
-        sortedProducts.sort((a, b) => b.rating - a.rating);
-      }
+      const [response, facetsResponse] = await Promise.all([
+        axios.get(`${API}/products`, { params: { ...params, sort: SORT_PARAMS[filterParams.sort] } }),
+        axios.get(`${API}/products/facets`, { params }).catch(() => ({ data: {} }))
+      ]);
 
-      setProducts(sortedProducts);
+      setProducts(response.data);
+      setTotalProducts(facetsResponse.data.total ?? response.data.length);
+      const cursor = response.headers[NEXT_CURSOR_HEADER];
+      setNextPage(cursor ? { ...params, sort: SORT_PARAMS[filterParams.sort], cursor } : null);
     } catch (error) {
       console.error('Failed to fetch products');
     } finally {
@@ -58,6 +66,20 @@ const ProductListPage = () => {
     }
   };
 
+  const loadMoreProducts = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/products`, { params: nextPage });
+      setProducts(prev => [...prev, ...response.data]);
+      const cursor = response.headers[NEXT_CURSOR_HEADER];
+      setNextPage(cursor ? { ...nextPage, cursor } : null);
+    } catch (error) {
+      console.error('Failed to fetch products');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSortChange = (sort) => {
     setFilters(prev => ({ ...prev, sort }));
     fetchProducts({ ...filters, sort });
@@ -85,7 +107,7 @@ const ProductListPage = () => {
                   ? `Search: ${filters.search}`
                   : 'All Products'}
               </h1>
-              <p className="text-gray-600 mt-2" data-testid="product-count">{products.length} products found</p>
+              <p className="text-gray-600 mt-2" data-testid="product-count">{totalProducts} products found</p>
             </div>
 
             <div className="flex items-center space-x-4">
@@ -198,6 +220,18 @@ const ProductListPage = () => {
                   ))}
                 </div>
               )}
+              {!loading && nextPage && (
+                <div className="text-center mt-8">
+                  <button
+                    onClick={loadMoreProducts}
+                    disabled={loadingMore}
+                    className="btn-secondary disabled:opacity-50"
+                    data-testid="load-more-products"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load More'}
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         </div>
@@ -0,0 +1,105 @@
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import mongomock
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Module-level settings are read when server is imported: mongomock has no
+# transactions (see the `transactions` fixture), and the tests call endpoints
+# faster than the login limits allow.
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ["CHECKOUT_TRANSACTIONS"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import server  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    client = AsyncMongoMockClient(tz_aware=True)
+    database = client[os.environ["DB_NAME"]]
+    await ensure_indexes(database)
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", database)
+    # The queue is not started; enqueued jobs stay pending in the outbox
+    monkeypatch.setattr(server.job_queue, "db", database)
+    monkeypatch.setitem(server.catalog_state, "version", None)
+    # Versions restart with each database, so an index built for another test's
+    # catalog would look current
+    monkeypatch.setitem(server.search_state, "version", None)
+    monkeypatch.setitem(server.search_state, "rebuild", None)
+    server.catalog_cache.clear()
+    yield database
+    server.catalog_cache.clear()
+
+
+@pytest.fixture
+async def api(db):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def auth_headers(api):
+    response = await api.post("/api/auth/register", json={"email": "shopper@example.com", "password": "secret", "name": "Shopper"})
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+class RecordingSession:
+    """Stands in for a client session: runs the transaction callback once and
+    counts commits and aborts. mongomock cannot roll anything back."""
+
+    def __init__(self):
+        self.committed = 0
+        self.aborted = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def with_transaction(self, callback):
+        try:
+            result = await callback(self)
+        except BaseException:
+            self.aborted += 1
+            raise
+        self.committed += 1
+        return result
+
+
+@pytest.fixture
+def transactions(db, monkeypatch):
+    """Run the transactional code paths, with sessions accepted and ignored."""
+    sessions = []
+
+    async def start_session():
+        session = RecordingSession()
+        sessions.append(session)
+        return session
+
+    mongomock.ignore_feature("session")
+    monkeypatch.setattr(server.client, "start_session", start_session)
+    monkeypatch.setitem(server.transaction_state, "enabled", True)
+    monkeypatch.setattr(server.job_queue, "transactions", True)
+    yield sessions
+    mongomock.warn_on_feature("session")
+
+
+def make_product(**fields):
+    defaults = {"name": "Test product", "description": "For tests", "price": 100, "category": "skincare",
+                "images": ["https://example.com/product.jpg"]}
+    return server.Product(**{**defaults, **fields}).model_dump()
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import analytics
+
+pytestmark = pytest.mark.anyio
+
+
+def order(created_at, total_amount, items, payment_method="cod", order_status="pending"):
+    return {"created_at": created_at, "total_amount": total_amount, "items": items,
+            "payment_method": payment_method, "order_status": order_status}
+
+
+ORDERS = [
+    order(datetime(2024, 5, 1, 9, tzinfo=timezone.utc), 500.0, [
+        {"product_id": "p1", "price": 100.0, "quantity": 2, "category": "skincare"},
+        {"product_id": "p2", "price": 300.0, "quantity": 1, "category": "haircare"},
+    ]),
+    # A naive string written before timestamps were native datetimes
+    order("2024-05-01T23:30:00", 150.0, [{"product_id": "p1", "price": 75.0, "quantity": 2, "category": "skincare"}], "card"),
+    order(datetime(2024, 5, 2, 0, 30, tzinfo=timezone.utc), 100.0, [{"product_id": "p3", "price": 100.0, "quantity": 1}]),
+]
+
+
+@pytest.fixture
+async def recorded(db):
+    for placed in ORDERS:
+        await analytics.record_order(db, placed)
+    return db
+
+
+def day(day_of_month):
+    return datetime(2024, 5, day_of_month, tzinfo=timezone.utc)
+
+
+async def test_orders_roll_up_per_day(recorded):
+    result = await analytics.query_rollups(recorded, "all")
+
+    assert [(row['day'], row['revenue'], row['orders'], row['units']) for row in result['series']] == [
+        (day(1), 650.0, 2, 5), (day(2), 100.0, 1, 1)]
+    assert result['totals'] == {"all": {"revenue": 750.0, "orders": 3, "units": 6}}
+
+
+async def test_category_revenue_is_the_sum_of_its_lines(recorded):
+    totals = (await analytics.query_rollups(recorded, "category"))['totals']
+
+    assert totals == {
+        "skincare": {"revenue": 350.0, "orders": 2, "units": 4},
+        "haircare": {"revenue": 300.0, "orders": 1, "units": 1},
+        "unknown": {"revenue": 100.0, "orders": 1, "units": 1},
+    }
+
+
+async def test_status_change_moves_the_order_between_buckets(recorded):
+    await analytics.record_status_change(recorded, ORDERS[0], "pending", "shipped")
+
+    totals = (await analytics.query_rollups(recorded, "order_status"))['totals']
+
+    assert totals['pending'] == {"revenue": 250.0, "orders": 2, "units": 3}
+    assert totals['shipped'] == {"revenue": 500.0, "orders": 1, "units": 3}
+    assert (await analytics.query_rollups(recorded, "all"))['totals']['all']['orders'] == 3
+
+
+async def test_date_range_is_by_utc_day(recorded):
+    result = await analytics.query_rollups(recorded, "payment_method", start=datetime(2024, 5, 1, 12, tzinfo=timezone.utc),
+                                           end=day(2))
+
+    assert result['totals'] == {"cod": {"revenue": 500.0, "orders": 1, "units": 3},
+                                "card": {"revenue": 150.0, "orders": 1, "units": 2}}
+
+
+async def test_sales_endpoint_reads_rollups(api, recorded):
+    response = await api.get("/api/admin/analytics/sales", params={"dimension": "payment_method", "start": "2024-05-02"})
+
+    assert response.status_code == 200
+    assert response.json()['totals'] == {"cod": {"revenue": 100.0, "orders": 1, "units": 1}}
@@ -0,0 +1,75 @@
+import pytest
+
+import server
+from server import CartBatchItem
+
+pytestmark = pytest.mark.anyio
+
+
+async def cart_items(db):
+    cart = await db.carts.find_one({"user_id": "user-1"}, {"_id": 0, "items": 1})
+    return {item['product_id']: item['quantity'] for item in cart['items']}
+
+
+async def test_add_creates_and_increments_lines(db):
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=2)])
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=3), CartBatchItem(product_id="p2")])
+
+    assert await cart_items(db) == {"p1": 5, "p2": 1}
+
+
+async def test_add_stops_at_line_limit(db):
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=server.MAX_LINE_QUANTITY)])
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=1)])
+
+    assert await cart_items(db) == {"p1": server.MAX_LINE_QUANTITY}
+
+
+async def test_set_replaces_quantity(db):
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=4)])
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=2, mode="set")])
+
+    assert await cart_items(db) == {"p1": 2}
+
+
+async def test_zero_quantity_removes_line(db):
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1"), CartBatchItem(product_id="p2")])
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=0, mode="set")])
+
+    assert await cart_items(db) == {"p2": 1}
+
+
+async def test_product_id_is_not_evaluated_as_expression(db):
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="$items")])
+
+    assert await cart_items(db) == {"$items": 1}
+
+
+async def test_update_without_cart_does_not_create_one(db):
+    result = await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1")], existing_only=True)
+
+    assert result.matched_count == 0
+    assert await db.carts.count_documents({}) == 0
+
+
+async def test_update_leaves_products_not_in_the_cart_alone(db):
+    await server.apply_cart_changes("user-1", [CartBatchItem(product_id="p1", quantity=2)])
+
+    result = await server.apply_cart_changes(
+        "user-1", [CartBatchItem(product_id="p2", quantity=3, mode="set"), CartBatchItem(product_id="p1", quantity=5, mode="set")],
+        existing_only=True
+    )
+
+    assert result.matched_count == 1
+    assert await cart_items(db) == {"p1": 5}
+
+
+async def test_put_only_changes_existing_lines(api, auth_headers, db):
+    assert (await api.put("/api/cart/p1", params={"quantity": 2}, headers=auth_headers)).status_code == 404
+    await api.post("/api/cart", json={"product_id": "p1"}, headers=auth_headers)
+
+    response = await api.put("/api/cart/p2", params={"quantity": 2}, headers=auth_headers)
+
+    assert response.status_code == 200
+    cart = await db.carts.find_one({}, {"_id": 0, "items": 1})
+    assert cart["items"] == [{"product_id": "p1", "quantity": 1}]
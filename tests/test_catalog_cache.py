@@ -0,0 +1,89 @@
+import pytest
+
+import server
+from cache import TTLCache
+from tests.conftest import make_product
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def catalog(db):
+    await db.products.insert_many([make_product(id=f"p{index}", name=f"Product {index}") for index in range(3)])
+    await server.bump_catalog_version()
+
+
+async def names(api, path="/api/products"):
+    response = await api.get(path)
+    body = response.json()
+    return {product['name'] for product in body} if isinstance(body, list) else body['name']
+
+
+async def test_reads_are_served_from_the_cache(api, db, catalog):
+    await names(api)
+    # A write that bypasses the API is not seen until the version changes
+    await db.products.update_one({"id": "p0"}, {"$set": {"name": "Renamed"}})
+
+    assert "Product 0" in await names(api)
+    assert server.catalog_cache.hits >= 1
+
+
+@pytest.mark.parametrize("write", ["update", "delete"])
+async def test_admin_writes_invalidate_cached_reads(api, catalog, write):
+    assert await names(api) == {"Product 0", "Product 1", "Product 2"}
+    assert await names(api, "/api/products/p0") == "Product 0"
+
+    if write == "update":
+        await api.put("/api/admin/products/p0", json={"name": "Renamed", "description": "d", "price": 10,
+                                                      "category": "skincare", "images": []})
+        assert await names(api) == {"Renamed", "Product 1", "Product 2"}
+        assert await names(api, "/api/products/p0") == "Renamed"
+    else:
+        await api.delete("/api/admin/products/p0")
+        assert await names(api) == {"Product 1", "Product 2"}
+        assert (await api.get("/api/products/p0")).status_code == 404
+
+
+async def test_another_process_bump_is_seen_after_the_poll_interval(api, db, catalog, monkeypatch):
+    await names(api)
+    await db.products.update_one({"id": "p0"}, {"$set": {"name": "Renamed"}})
+    await db.counters.update_one({"_id": "catalog_version"}, {"$inc": {"value": 1}})
+
+    assert "Product 0" in await names(api)
+    monkeypatch.setitem(server.catalog_state, "checked_at", server.catalog_state['checked_at'] - server.CATALOG_VERSION_POLL_INTERVAL)
+    assert "Renamed" in await names(api)
+
+
+async def test_results_read_across_a_version_bump_are_not_cached(db, catalog):
+    version = await server.get_catalog_version()
+    await server.bump_catalog_version()
+
+    server.cache_catalog(("products",), ["stale"], version)
+
+    assert server.catalog_cache.get(("products",)) is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+
+    now[0] += 11
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert len(cache) == 1
@@ -0,0 +1,229 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from tests.conftest import make_product
+
+pytestmark = pytest.mark.anyio
+
+ADDRESS = {"name": "Shopper", "phone": "1", "address_line1": "1 Street", "city": "City", "state": "State", "pincode": "1"}
+
+
+async def insert_products(db, *products):
+    await db.products.insert_many([dict(product) for product in products])
+    await server.bump_catalog_version()
+    return {product['id']: product for product in products}
+
+
+async def stock_of(db, product_id):
+    return await db.products.find_one({"id": product_id}, {"_id": 0, "stock": 1, "in_stock": 1, "reservations": 1})
+
+
+def reservations(doc):
+    return [(entry['order_id'], entry['quantity']) for entry in doc.get('reservations', [])]
+
+
+async def test_reserve_and_release_stock(db):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+
+    reserved, sold_out = await server.reserve_stock("order-1", {product['id']: 2})
+    assert reserved == {product['id']: 2}
+    assert not sold_out
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 3
+    assert reservations(doc) == [("order-1", 2)]
+
+    await server.release_stock("order-1", reserved)
+    await server.release_stock("order-1", reserved)
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 5
+    assert reservations(doc) == []
+
+
+async def test_concurrent_reservations_keep_their_own_entries(db):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+
+    await asyncio.gather(
+        server.reserve_stock("order-1", {product['id']: 2}),
+        server.reserve_stock("order-2", {product['id']: 3}),
+    )
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 0
+    assert not doc['in_stock']
+    assert sorted(reservations(doc)) == [("order-1", 2), ("order-2", 3)]
+
+    await server.release_stock("order-1", {product['id']: 2})
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 2
+    assert doc['in_stock']
+    assert reservations(doc) == [("order-2", 3)]
+
+
+async def test_partial_reservation_is_released(db):
+    plenty, scarce = make_product(stock=10), make_product(stock=1)
+    await insert_products(db, plenty, scarce)
+
+    with pytest.raises(HTTPException) as error:
+        await server.reserve_stock("order-1", {plenty['id']: 2, scarce['id']: 2})
+    assert error.value.status_code == 409
+    assert error.value.detail['product_ids'] == [scarce['id']]
+    assert (await stock_of(db, plenty['id']))['stock'] == 10
+    assert (await stock_of(db, scarce['id']))['stock'] == 1
+
+
+async def test_untracked_stock_is_not_reserved(db):
+    product = make_product()
+    await insert_products(db, product)
+
+    assert await server.reserve_stock("order-1", {product['id']: 2}) == ({}, False)
+
+
+async def test_checkout_retry_with_same_key_places_one_order(db, api, auth_headers):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+    body = {"items": [{"product_id": product['id'], "quantity": 2}], "address": ADDRESS, "payment_method": "cod"}
+    headers = {**auth_headers, "Idempotency-Key": "checkout-1"}
+
+    first = await api.post("/api/orders", json=body, headers=headers)
+    retry = await api.post("/api/orders", json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()['order_id'] == first.json()['order_id']
+    assert await db.orders.count_documents({}) == 1
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 3
+    # Reservations are settled when the order is written
+    assert reservations(doc) == []
+
+
+async def test_checkout_rejects_oversized_cart_line(db, api, auth_headers):
+    product = make_product()
+    await insert_products(db, product)
+    user_id = (await db.users.find_one({}))['id']
+    await db.carts.insert_one({"user_id": user_id, "items": [{"product_id": product['id'], "quantity": 150}]})
+
+    response = await api.post("/api/orders", json={"address": ADDRESS, "payment_method": "cod"}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.json()['detail']['product_ids'] == [product['id']]
+    assert await db.orders.count_documents({}) == 0
+
+
+async def test_checkout_commits_in_one_transaction(db, api, auth_headers, transactions):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+    body = {"items": [{"product_id": product['id'], "quantity": 2}], "address": ADDRESS, "payment_method": "cod"}
+
+    response = await api.post("/api/orders", json=body, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert [(session.committed, session.aborted) for session in transactions] == [(1, 0)]
+    assert await db.orders.count_documents({"id": response.json()['order_id']}) == 1
+    assert await db.outbox.count_documents({"name": "record_order"}) == 1
+    assert (await stock_of(db, product['id']))['stock'] == 3
+
+
+@pytest.mark.parametrize("hello, enabled", [
+    ({"isWritablePrimary": True, "setName": "rs0"}, True),
+    ({"isWritablePrimary": True, "msg": "isdbgrid"}, True),
+    ({"isWritablePrimary": True}, False),
+    (ConnectionError("unreachable"), False),
+])
+async def test_transactions_follow_the_topology(db, monkeypatch, hello, enabled):
+    async def command(name):
+        assert name == "hello"
+        if isinstance(hello, Exception):
+            raise hello
+        return hello
+
+    monkeypatch.setattr(server, "CHECKOUT_TRANSACTIONS", "auto")
+    monkeypatch.setattr(db, "command", command)
+    monkeypatch.setitem(server.transaction_state, "enabled", not enabled)
+    monkeypatch.setattr(server.job_queue, "transactions", not enabled)
+
+    await server.configure_transactions()
+
+    assert server.transaction_state['enabled'] is enabled
+    assert server.job_queue.transactions is enabled
+
+
+@pytest.mark.parametrize("setting, enabled", [("true", True), ("false", False)])
+async def test_transactions_setting_overrides_detection(db, monkeypatch, setting, enabled):
+    monkeypatch.setattr(server, "CHECKOUT_TRANSACTIONS", setting)
+    monkeypatch.setitem(server.transaction_state, "enabled", not enabled)
+    monkeypatch.setattr(server.job_queue, "transactions", not enabled)
+
+    await server.configure_transactions()
+
+    assert server.transaction_state['enabled'] is enabled
+
+
+async def test_failure_before_the_order_is_written_gives_stock_back(db, api, auth_headers, monkeypatch):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+
+    async def failing_write(order_doc, user_id, jobs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(server, "write_order", failing_write)
+    body = {"items": [{"product_id": product['id'], "quantity": 2}], "address": ADDRESS, "payment_method": "cod"}
+    with pytest.raises(RuntimeError):
+        await api.post("/api/orders", json=body, headers=auth_headers)
+
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 5
+    assert reservations(doc) == []
+
+
+async def test_failure_after_the_order_is_written_keeps_its_stock(db, api, auth_headers, monkeypatch):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+
+    async def partial_write(order_doc, user_id, jobs):
+        # As without a transaction: the order insert landed, a later write failed
+        await db.orders.insert_one(dict(order_doc))
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(server, "write_order", partial_write)
+    body = {"items": [{"product_id": product['id'], "quantity": 2}], "address": ADDRESS, "payment_method": "cod"}
+    with pytest.raises(RuntimeError):
+        await api.post("/api/orders", json=body, headers=auth_headers)
+
+    assert await db.orders.count_documents({}) == 1
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 3
+    assert reservations(doc) == []
+
+
+async def test_reaper_settles_written_orders_and_releases_abandoned_ones(db, monkeypatch):
+    product = make_product(stock=10)
+    await insert_products(db, product)
+    await server.reserve_stock("written", {product['id']: 2})
+    await server.reserve_stock("abandoned", {product['id']: 3})
+    await db.orders.insert_one({"id": "written"})
+
+    monkeypatch.setattr(server, "RESERVATION_TIMEOUT", 3600)
+    assert await server.reap_reservations() == {"settled": 0, "released": 0}
+    assert len(reservations(await stock_of(db, product['id']))) == 2
+
+    monkeypatch.setattr(server, "RESERVATION_TIMEOUT", 0)
+    assert await server.reap_reservations() == {"settled": 1, "released": 1}
+    doc = await stock_of(db, product['id'])
+    assert doc['stock'] == 8
+    assert reservations(doc) == []
+    assert await server.reap_reservations() == {"settled": 0, "released": 0}
+
+
+async def test_catalog_responses_do_not_expose_stock(db, api):
+    product = make_product(stock=5)
+    await insert_products(db, product)
+
+    listed = (await api.get("/api/products")).json()
+    single = (await api.get(f"/api/products/{product['id']}")).json()
+
+    assert listed[0].get('stock') is None
+    assert single.get('stock') is None
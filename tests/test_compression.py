@@ -0,0 +1,127 @@
+import gzip
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import server
+from compression import CompressionMiddleware, choose_encoding, encoded_etag, split_etag
+from tests.conftest import make_product
+
+pytestmark = pytest.mark.anyio
+
+BIG = {"items": ["x" * 50] * 40}
+
+
+def make_app():
+    async def big(request):
+        return JSONResponse(BIG, headers={"ETag": '"v1"'})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def image(request):
+        return Response(b"\x89PNG" * 500, media_type="image/png")
+
+    async def stream(request):
+        async def chunks():
+            for index in range(5):
+                yield f'{{"line": {index}, "pad": "{"y" * 200}"}}\n'.encode()
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    app = Starlette(routes=[Route("/big", big), Route("/small", small), Route("/image", image), Route("/stream", stream)])
+    return CompressionMiddleware(app, minimum_size=500)
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=make_app()), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip;q=0.5", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+    ("gzip;q=0", None),
+])
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_encoded_etag_round_trips():
+    assert encoded_etag('"c3-abc"', "gzip") == '"c3-abc-gzip"'
+    assert split_etag('"c3-abc-gzip"') == ('"c3-abc"', "gzip")
+    assert split_etag('W/"c3-abc-br"') == ('"c3-abc"', "br")
+    assert split_etag('"c3-abc"') == ('"c3-abc"', None)
+
+
+async def test_large_json_is_compressed_with_a_strong_per_encoding_tag(client):
+    response = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers['content-encoding'] == "gzip"
+    assert response.headers['etag'] == '"v1-gzip"'
+    assert response.headers['vary'] == "Accept-Encoding"
+    assert int(response.headers['content-length']) < len(response.content)
+    assert response.json() == BIG
+
+
+async def test_uncompressed_responses_keep_their_tag(client):
+    response = await client.get("/big", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers['etag'] == '"v1"'
+    assert response.headers['vary'] == "Accept-Encoding"
+
+
+async def test_small_and_binary_responses_pass_through(client):
+    small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    image = await client.get("/image", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in image.headers
+    assert "vary" not in image.headers
+
+
+async def test_streamed_responses_are_compressed_incrementally(client):
+    async with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert response.headers['content-encoding'] == "gzip"
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert len(lines) == 5
+
+
+@pytest.fixture
+async def catalog(db):
+    await db.products.insert_many([make_product(name=f"Product {index}") for index in range(5)])
+    await server.bump_catalog_version()
+
+
+@pytest.mark.parametrize("serialize_trusted", [True, False])
+async def test_catalog_304_returns_the_variant_tag_with_vary(db, api, catalog, monkeypatch, serialize_trusted):
+    monkeypatch.setattr(server, "SERIALIZE_TRUSTED_DOCUMENTS", serialize_trusted)
+    first = await api.get("/api/products", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers['etag']
+    assert first.headers['content-encoding'] == "gzip"
+    assert etag.startswith('"c') and etag.endswith('-gzip"')
+
+    revalidated = await api.get("/api/products", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+
+    assert revalidated.status_code == 304
+    assert revalidated.headers['etag'] == etag
+    assert revalidated.headers['vary'] == "Accept-Encoding"
+
+
+async def test_catalog_compressed_tag_does_not_match_for_identity_client(db, api, catalog):
+    etag = (await api.get("/api/products", headers={"Accept-Encoding": "gzip"})).headers['etag']
+
+    response = await api.get("/api/products", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers['etag'] == split_etag(etag)[0]
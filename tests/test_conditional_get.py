@@ -0,0 +1,69 @@
+import pytest
+
+import server
+from tests.conftest import make_product
+
+pytestmark = pytest.mark.anyio
+
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+async def catalog(db):
+    await db.products.insert_many([make_product(id=f"p{index}", name=f"Product {index}") for index in range(3)])
+    await server.bump_catalog_version()
+
+
+async def get(api, path, **headers):
+    return await api.get(path, headers={**IDENTITY, **headers})
+
+
+@pytest.mark.parametrize("path", ["/api/products", "/api/products/p1", "/api/products/facets", "/api/products/suggest?q=prod"])
+async def test_catalog_routes_answer_304_to_their_own_tag(api, catalog, path):
+    first = await get(api, path)
+    etag = first.headers['etag']
+    assert first.status_code == 200
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    revalidated = await get(api, path, **{"If-None-Match": etag})
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers['etag'] == etag
+    assert revalidated.headers['cache-control'] == server.CATALOG_CACHE_CONTROL
+
+
+async def test_tag_depends_on_the_query_not_its_order(api, catalog):
+    a = await get(api, "/api/products?category=skincare&limit=2")
+    b = await get(api, "/api/products?limit=2&category=skincare")
+    c = await get(api, "/api/products?category=haircare&limit=2")
+
+    assert a.headers['etag'] == b.headers['etag'] != c.headers['etag']
+
+
+@pytest.mark.parametrize("if_none_match", ['"other", {etag}', "W/{etag}", "*"])
+async def test_if_none_match_lists_weak_tags_and_wildcard(api, catalog, if_none_match):
+    etag = (await get(api, "/api/products")).headers['etag']
+
+    response = await get(api, "/api/products", **{"If-None-Match": if_none_match.format(etag=etag)})
+
+    assert response.status_code == 304
+
+
+async def test_catalog_write_invalidates_the_tag(api, catalog):
+    etag = (await get(api, "/api/products")).headers['etag']
+
+    await api.post("/api/admin/products", json={"id": "p9", "name": "New", "description": "d", "price": 10,
+                                                "category": "skincare", "images": []})
+    response = await get(api, "/api/products", **{"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+    assert "p9" in [product['id'] for product in response.json()]
+
+
+async def test_unknown_tag_gets_the_full_response(api, catalog):
+    response = await get(api, "/api/products/p1", **{"If-None-Match": '"c0-0000000000000000"'})
+
+    assert response.status_code == 200
+    assert response.json()['id'] == "p1"
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from jobs import OUTBOX, JobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+def make_queue(db, transactions=False, **options):
+    queue = JobQueue(transactions=transactions, **options)
+    # Not started: jobs are claimed and run by the test, not by workers
+    queue.db = db
+    return queue
+
+
+def counting_handler(queue, calls, failures=0):
+    @queue.handler("count")
+    async def count(database, payload, session=None):
+        calls.append(payload['n'])
+        if len(calls) <= failures:
+            raise RuntimeError("flaky")
+        await database.counters.update_one({"_id": "count"}, {"$inc": {"value": payload['n']}}, upsert=True, session=session)
+    return count
+
+
+async def outbox_job(db, job_id):
+    return await db[OUTBOX].find_one({"_id": job_id})
+
+
+async def counter_value(db):
+    return (await db.counters.find_one({"_id": "count"}) or {}).get("value", 0)
+
+
+async def make_due(db, job_id):
+    await db[OUTBOX].update_one({"_id": job_id}, {"$set": {"run_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+
+
+async def expire_lease(db, job_id):
+    await db[OUTBOX].update_one({"_id": job_id}, {"$set": {"locked_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+
+
+async def test_failed_job_is_retried_with_backoff(db):
+    queue, calls = make_queue(db, backoff_base=60), []
+    counting_handler(queue, calls, failures=1)
+    job_id = await queue.enqueue("count", {"n": 1})
+
+    await queue._run(await queue._claim(job_id))
+
+    job = await outbox_job(db, job_id)
+    assert job['status'] == "pending"
+    assert job['attempts'] == 1
+    assert job['last_error'] == "RuntimeError: flaky"
+    assert job['run_at'].replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(seconds=25)
+    # Not due yet
+    assert await queue._claim(job_id) is None
+
+    await make_due(db, job_id)
+    await queue._run(await queue._claim(job_id))
+
+    job = await outbox_job(db, job_id)
+    assert job['status'] == "done"
+    assert job['attempts'] == 2
+    assert calls == [1, 1]
+    assert await counter_value(db) == 1
+    assert (queue.completed, queue.retried, queue.failed) == (1, 1, 0)
+
+
+async def test_job_fails_permanently_after_max_attempts(db):
+    queue, calls = make_queue(db, max_attempts=2, backoff_base=0), []
+    counting_handler(queue, calls, failures=10)
+    job_id = await queue.enqueue("count", {"n": 1})
+
+    for _ in range(2):
+        await make_due(db, job_id)
+        await queue._run(await queue._claim(job_id))
+
+    job = await outbox_job(db, job_id)
+    assert job['status'] == "failed"
+    assert job['attempts'] == 2
+    await make_due(db, job_id)
+    assert await queue._claim(job_id) is None
+    assert (queue.completed, queue.retried, queue.failed) == (0, 1, 1)
+
+
+async def test_running_job_is_reclaimed_only_after_its_lease_expires(db):
+    first, second = make_queue(db), make_queue(db)
+    counting_handler(first, [])
+    counting_handler(second, [])
+    job_id = await first.enqueue("count", {"n": 1})
+
+    assert await first._claim(job_id) is not None
+    assert await second._claim(job_id) is None
+
+    await expire_lease(db, job_id)
+    reclaimed = await second._claim(job_id)
+    assert reclaimed['owner'] == second.owner
+    assert reclaimed['attempts'] == 2
+
+
+async def test_lost_lease_is_not_marked_done_by_the_old_owner(db):
+    first, second = make_queue(db), make_queue(db)
+    first_calls, second_calls = [], []
+    counting_handler(first, first_calls)
+    counting_handler(second, second_calls)
+    job_id = await first.enqueue("count", {"n": 1})
+    stale = await first._claim(job_id)
+    await expire_lease(db, job_id)
+    await second._claim(job_id)
+
+    await first._run(stale)
+
+    # Without transactions the handler ran, but completion stays with the new owner
+    job = await outbox_job(db, job_id)
+    assert job['status'] == "running"
+    assert job['owner'] == second.owner
+    assert first_calls == [1]
+    assert first.completed == 0
+
+    await second._run(job)
+    assert (await outbox_job(db, job_id))['status'] == "done"
+    assert second.completed == 1
+
+
+async def test_lost_lease_aborts_before_the_handler_in_a_transaction(db, transactions):
+    first, second = make_queue(db, transactions=True), make_queue(db, transactions=True)
+    first_calls, second_calls = [], []
+    counting_handler(first, first_calls)
+    counting_handler(second, second_calls)
+    job_id = await first.enqueue("count", {"n": 1})
+    stale = await first._claim(job_id)
+    await expire_lease(db, job_id)
+    job = await second._claim(job_id)
+
+    await first._run(stale)
+    await second._run(job)
+
+    assert first_calls == []
+    assert second_calls == [1]
+    assert await counter_value(db) == 1
+    assert [(session.committed, session.aborted) for session in transactions] == [(0, 1), (1, 0)]
+    assert (await outbox_job(db, job_id))['status'] == "done"
+
+
+async def test_handler_failure_in_a_transaction_leaves_the_job_pending(db, transactions):
+    queue, calls = make_queue(db, transactions=True, backoff_base=0), []
+    counting_handler(queue, calls, failures=1)
+    job_id = await queue.enqueue("count", {"n": 1})
+
+    await queue._run(await queue._claim(job_id))
+
+    assert [(session.committed, session.aborted) for session in transactions] == [(0, 1)]
+    # A real transaction also rolls back the "done" update; mongomock cannot,
+    # so only the retry bookkeeping written afterwards is checked here.
+    job = await outbox_job(db, job_id)
+    assert job['attempts'] == 1
+    assert job['last_error'] == "RuntimeError: flaky"
+
+
+@pytest.mark.parametrize("in_transaction", [False, True])
+async def test_status_change_and_its_job_are_written_together(db, api, request, in_transaction):
+    sessions = request.getfixturevalue("transactions") if in_transaction else []
+    await db.orders.insert_one({"id": "order-1", "order_status": "placed", "total_amount": 10.0, "items": [],
+                                "created_at": datetime.now(timezone.utc)})
+
+    response = await api.put("/api/admin/orders/order-1/status", json={"status": "shipped"})
+    unchanged = await api.put("/api/admin/orders/order-1/status", json={"status": "shipped"})
+
+    assert response.status_code == unchanged.status_code == 200
+    assert (await db.orders.find_one({"id": "order-1"}))['order_status'] == "shipped"
+    jobs = await db[OUTBOX].find({"name": "record_status_change"}).to_list(None)
+    assert [(job['payload']['old_status'], job['payload']['new_status']) for job in jobs] == [("placed", "shipped")]
+    assert [session.committed for session in sessions] == ([1, 1] if in_transaction else [])
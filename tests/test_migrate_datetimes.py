@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from migrate_datetimes import migrate_field
+
+pytestmark = pytest.mark.anyio
+
+EXISTING = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def users(db):
+    await db.users.insert_many([
+        {"_id": 1, "id": "u1", "email": "a@example.com", "created_at": "2024-05-01T10:00:00"},
+        {"_id": 2, "id": "u2", "email": "b@example.com", "created_at": "2024-05-01T10:00:00+05:30"},
+        {"_id": 3, "id": "u3", "email": "c@example.com", "created_at": EXISTING},
+        {"_id": 4, "id": "u4", "email": "d@example.com", "created_at": "yesterday"},
+        {"_id": 5, "id": "u5", "email": "e@example.com", "created_at": "2024-06-01T00:00:00Z"},
+    ])
+    return db.users
+
+
+async def created_at(collection):
+    return {doc['_id']: doc['created_at'] async for doc in collection.find()}
+
+
+async def test_strings_become_utc_datetimes(db, users, capsys):
+    converted, failed = await migrate_field(db, "users", "created_at", batch_size=2)
+
+    values = await created_at(users)
+    assert (converted, failed) == (3, 1)
+    assert values[1] == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+    assert values[2] == datetime(2024, 5, 1, 10, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    assert values[3] == EXISTING
+    assert values[4] == "yesterday"
+    assert values[5] == datetime(2024, 6, 1, tzinfo=timezone.utc)
+    checkpoint = await db.migrations.find_one({"_id": "datetimes:users.created_at"})
+    assert checkpoint['done'] and checkpoint['last_id'] == 5
+    assert "skipping users _id=4" in capsys.readouterr().out
+
+
+async def test_resumes_after_the_checkpoint(db, users):
+    await db.migrations.insert_one({"_id": "datetimes:users.created_at", "last_id": 2, "converted": 2, "failed": 0})
+
+    converted, failed = await migrate_field(db, "users", "created_at", batch_size=10)
+
+    values = await created_at(users)
+    assert (converted, failed) == (3, 1)
+    assert isinstance(values[1], str) and isinstance(values[5], datetime)
+
+
+async def test_restart_ignores_the_checkpoint(db, users):
+    await db.migrations.insert_one({"_id": "datetimes:users.created_at", "last_id": 5, "converted": 3, "failed": 1})
+
+    converted, _ = await migrate_field(db, "users", "created_at", batch_size=10, restart=True)
+
+    assert converted == 3
+    assert isinstance((await created_at(users))[1], datetime)
+
+
+async def test_dry_run_writes_nothing(db, users):
+    converted, failed = await migrate_field(db, "users", "created_at", batch_size=10, dry_run=True)
+
+    assert (converted, failed) == (3, 1)
+    assert isinstance((await created_at(users))[1], str)
+    assert await db.migrations.count_documents({}) == 0
@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from pagination import decode_cursor, encode_cursor, paginate
+
+pytestmark = pytest.mark.anyio
+
+RATINGS = [4.0, None, 3.5, 4.0, None, 5.0, 3.5, None, 4.5]
+
+
+@pytest.fixture
+async def products(db):
+    docs = [{"id": f"p{index}", "rating": rating} for index, rating in enumerate(RATINGS)]
+    # A missing field sorts like null
+    del docs[1]['rating']
+    await db.products.insert_many([dict(doc) for doc in docs])
+    return db.products
+
+
+def expected_order(direction):
+    # Mongo sorts null before numbers; ties break on id in the same direction
+    keyed = [((rating is not None, rating or 0), f"p{index}") for index, rating in enumerate(RATINGS)]
+    return [product_id for _, product_id in sorted(keyed, reverse=direction == -1)]
+
+
+async def all_pages(collection, direction, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        docs, cursor = await paginate(collection, {}, "rating", direction, limit, cursor)
+        ids.extend(doc['id'] for doc in docs)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("direction", [1, -1])
+@pytest.mark.parametrize("limit", [1, 2, 4, 20])
+async def test_pages_cover_null_sort_values_once(products, direction, limit):
+    ids, pages = await all_pages(products, direction, limit)
+
+    assert ids == expected_order(direction)
+    assert pages == max(1, -(-len(RATINGS) // limit))
+
+
+def test_cursor_round_trips_datetimes():
+    created_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+    assert decode_cursor(encode_cursor([created_at, "p1"])) == [created_at, "p1"]
+    assert decode_cursor(encode_cursor([None, "p1"])) == [None, "p1"]
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    raw_cursor({"price": 1}),
+    raw_cursor([]),
+    raw_cursor([{"$gt": ""}, "p1"]),
+    raw_cursor([{"$dt": "yesterday"}, "p1"]),
+    raw_cursor([["nested"], "p1"]),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def product_body(**fields):
+    return {"name": "Test product", "description": "For tests", "price": 100, "category": "skincare",
+            "images": [], **fields}
+
+
+async def test_price_sort_pages_by_what_the_shopper_pays(api, db):
+    prices = {"a": (500, 100), "b": (300, None), "c": (200, None), "d": (900, 250)}
+    for product_id, (price, offer_price) in prices.items():
+        response = await api.post("/api/admin/products", json=product_body(id=product_id, price=price, offer_price=offer_price))
+        assert response.json()['effective_price'] == (offer_price or price)
+
+    ids, cursor = [], None
+    while True:
+        response = await api.get("/api/products", params={"sort": "effective_price", "limit": 1, **({"cursor": cursor} if cursor else {})})
+        ids.extend(product['id'] for product in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert ids == ["a", "c", "d", "b"]
+
+
+async def test_effective_price_follows_updates_and_ignores_the_client(api, db):
+    await api.post("/api/admin/products", json=product_body(id="p1", price=400, offer_price=300))
+
+    await api.put("/api/admin/products/p1", json=product_body(price=400, effective_price=1))
+
+    product = await db.products.find_one({"id": "p1"})
+    assert product['effective_price'] == 400
+
+
+async def test_backfill_sets_missing_effective_prices(db):
+    await db.products.insert_many([
+        {"id": "old-1", "price": 500, "offer_price": 450},
+        {"id": "old-2", "price": 200},
+        {"id": "new", "price": 100, "offer_price": None, "effective_price": 100},
+    ])
+
+    await server.backfill_derived_fields()
+
+    prices = {doc['id']: doc['effective_price'] async for doc in db.products.find()}
+    assert prices == {"old-1": 450, "old-2": 200, "new": 100}
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.hash import bcrypt
+
+import server
+from passwords import BCRYPT_ROUNDS, PasswordHasher, PasswordHasherBusy
+
+pytestmark = pytest.mark.anyio
+
+
+def rounds(hashed: str) -> int:
+    return bcrypt.from_string(hashed).rounds
+
+
+@pytest.fixture
+async def hasher():
+    hasher = PasswordHasher(executor="thread", workers=2)
+    yield hasher
+    hasher.shutdown()
+
+
+async def test_hash_and_verify_in_the_pool(hasher):
+    hashed = await hasher.hash("secret")
+
+    assert rounds(hashed) == BCRYPT_ROUNDS
+    assert await hasher.verify_and_update("secret", hashed) == (True, None)
+    assert (await hasher.verify_and_update("wrong", hashed))[0] is False
+    assert hasher.stats()['completed'] == 3
+
+
+async def test_hashing_does_not_block_the_event_loop(hasher):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.001)
+
+    task = asyncio.create_task(ticker())
+    await hasher.hash("secret")
+    task.cancel()
+
+    assert ticks > 1
+
+
+async def test_concurrency_is_bounded_and_excess_callers_rejected():
+    hasher = PasswordHasher(executor="thread", workers=2, max_concurrency=1, max_queue=1)
+    release = threading.Event()
+    running = []
+
+    def slow(value):
+        running.append(value)
+        release.wait(5)
+        return value
+
+    try:
+        first = asyncio.create_task(hasher._run(slow, 1))
+        second = asyncio.create_task(hasher._run(slow, 2))
+        await asyncio.sleep(0.05)
+
+        assert running == [1]
+        assert (hasher.in_flight, hasher.waiting) == (1, 1)
+        with pytest.raises(PasswordHasherBusy):
+            await hasher._run(slow, 3)
+
+        release.set()
+        assert await asyncio.gather(first, second) == [1, 2]
+        assert hasher.stats()['rejected'] == 1 and hasher.stats()['max_queue_depth'] == 1
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+def test_unknown_executor_is_rejected():
+    with pytest.raises(ValueError):
+        PasswordHasher(executor="gpu")
+
+
+async def test_login_rehashes_a_hash_with_another_cost(api, db, auth_headers):
+    old_cost = 4 if BCRYPT_ROUNDS != 4 else 5
+    await db.users.update_one({"email": "shopper@example.com"},
+                              {"$set": {"password": bcrypt.using(rounds=old_cost).hash("secret")}})
+
+    response = await api.post("/api/auth/login", json={"email": "shopper@example.com", "password": "secret"})
+
+    assert response.status_code == 200
+    assert rounds((await db.users.find_one({"email": "shopper@example.com"}))['password']) == BCRYPT_ROUNDS
+
+
+async def test_busy_hasher_answers_503(api, db, auth_headers, monkeypatch):
+    async def busy(*args):
+        raise PasswordHasherBusy()
+
+    monkeypatch.setattr(server.password_hasher, "verify_and_update", busy)
+
+    response = await api.post("/api/auth/login", json={"email": "shopper@example.com", "password": "secret"})
+
+    assert response.status_code == 503
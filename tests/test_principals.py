@@ -0,0 +1,58 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_principal_cache():
+    server.principal_cache.clear()
+    yield
+    server.principal_cache.clear()
+
+
+async def me(api, auth_headers):
+    return await api.get("/api/auth/me", headers=auth_headers)
+
+
+async def test_principal_is_cached_between_requests(api, db, auth_headers):
+    first = (await me(api, auth_headers)).json()
+    await db.users.update_one({"id": first['id']}, {"$set": {"name": "Changed elsewhere"}})
+
+    assert (await me(api, auth_headers)).json()['name'] == "Shopper"
+    assert server.principal_cache.get(first['id']) is not None
+
+
+async def test_profile_update_invalidates_the_principal(api, auth_headers):
+    await me(api, auth_headers)
+
+    response = await api.put("/api/auth/me", json={"phone": "555-0100"}, headers=auth_headers)
+
+    assert response.json()['phone'] == "555-0100"
+    assert (await me(api, auth_headers)).json()['phone'] == "555-0100"
+
+
+async def test_deleted_user_is_rejected_once_the_entry_is_gone(api, db, auth_headers):
+    user_id = (await me(api, auth_headers)).json()['id']
+    await db.users.delete_one({"id": user_id})
+
+    server.invalidate_principal(user_id)
+
+    assert (await me(api, auth_headers)).status_code == 401
+
+
+@pytest.mark.parametrize("trust_claims", [True, False])
+async def test_id_only_routes_skip_the_user_lookup_when_trusting_claims(api, db, auth_headers, monkeypatch, trust_claims):
+    monkeypatch.setattr(server, "AUTH_TRUST_TOKEN_CLAIMS", trust_claims)
+    await db.users.delete_many({})
+
+    response = await api.get("/api/cart", headers=auth_headers)
+
+    assert response.status_code == (200 if trust_claims else 401)
+
+
+async def test_invalid_token_is_rejected(api, db):
+    response = await api.get("/api/auth/me", headers={"Authorization": "Bearer not-a-token"})
+
+    assert response.status_code == 401
@@ -0,0 +1,67 @@
+import pytest
+
+from tests.conftest import make_product
+
+pytestmark = pytest.mark.anyio
+
+
+async def post_import(api, body: bytes, **params):
+    response = await api.post("/api/admin/products/import", params=params, content=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_ndjson_upserts_by_id_and_keeps_unset_fields(api, db):
+    await db.products.insert_one(make_product(id="p1", name="Old", rating=4.5))
+
+    report = await post_import(api, b'{"id": "p1", "name": "New", "description": "d", "price": 90, "category": "skincare", "images": []}\n'
+                                    b'{"id": "p2", "name": "Serum", "description": "d", "price": 50, "category": "skincare", "images": []}\n')
+
+    assert report["inserted"] == 1 and report["updated"] == 1 and report["failed"] == 0
+    updated = await db.products.find_one({"id": "p1"})
+    assert updated["name"] == "New" and updated["rating"] == 4.5
+    assert await db.products.count_documents({"id": "p2"}) == 1
+
+
+async def test_import_recomputes_effective_price_from_the_stored_offer(api, db):
+    await db.products.insert_one(make_product(id="p1", price=500, offer_price=400, effective_price=400))
+
+    await post_import(api, b"id,name,description,price,category,images\np1,Serum,d,450,skincare,\n", format="csv")
+
+    product = await db.products.find_one({"id": "p1"})
+    assert product["price"] == 450 and product["effective_price"] == 400
+
+
+async def test_csv_rows_and_errors_are_reported_by_row(api, db):
+    body = (b"id,name,description,price,category,images\n"
+            b'p1,Toner,"two\nlines",12,skincare,a.jpg|b.jpg\n'
+            b",No id,d,5,skincare,\n"
+            b"p3,Bad price,d,cheap,skincare,\n")
+
+    report = await post_import(api, body, format="csv")
+
+    assert report["rows"] == 3 and report["valid"] == 1 and report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert report["errors"][0]["errors"] == ["id: Field required"]
+    product = await db.products.find_one({"id": "p1"})
+    assert product["description"] == "two\nlines" and product["images"] == ["a.jpg", "b.jpg"]
+
+
+async def test_dry_run_validates_without_writing(api, db):
+    report = await post_import(api, b'{"id": "p1", "name": "Serum", "description": "d", "price": 50, "category": "skincare", "images": []}\n',
+                               dry_run="true")
+
+    assert report["valid"] == 1 and report["inserted"] == 0
+    assert await db.products.count_documents({}) == 0
+
+
+@pytest.mark.parametrize("import_format, header", [("ndjson", b""), ("csv", b"id,name,description,price,category,images\n")])
+async def test_undecodable_line_is_a_row_error(api, db, import_format, header):
+    good = (b'{"id": "p2", "name": "Serum", "description": "d", "price": 50, "category": "skincare", "images": []}\n'
+            if import_format == "ndjson" else b"p2,Serum,d,50,skincare,\n")
+
+    report = await post_import(api, header + b"\xff\xfe broken\n" + good, format=import_format)
+
+    assert report["rows"] == 2 and report["failed"] == 1 and report["inserted"] == 1
+    assert report["errors"][0]["row"] == 1
+    assert "not valid UTF-8" in report["errors"][0]["errors"][0]
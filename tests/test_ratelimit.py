@@ -0,0 +1,109 @@
+import pytest
+
+import server
+from ratelimit import RateLimited, RateLimiter, Policy
+
+pytestmark = pytest.mark.anyio
+
+
+def test_policy_parse():
+    assert Policy.parse("login", "10/60") == Policy("login", 10, 60.0, 10)
+    assert Policy.parse("login", "10/60:20") == Policy("login", 10, 60.0, 20)
+
+
+def test_bucket_allows_burst_then_refills():
+    limiter = RateLimiter([Policy.parse("login", "1/10:3")], shards=1)
+    policy = limiter.policies["login"]
+
+    assert [limiter._local(policy, "ip", 100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter._local(policy, "ip", 100.0) == pytest.approx(10.0)
+    # Other keys have their own buckets
+    assert limiter._local(policy, "other", 100.0) == 0.0
+    # One token back after a full period
+    assert limiter._local(policy, "ip", 110.0) == 0.0
+    assert limiter._local(policy, "ip", 110.0) > 0
+
+
+def test_evicted_bucket_restarts_full():
+    limiter = RateLimiter([Policy.parse("login", "1/60:1")], shards=1, max_keys=2)
+    policy = limiter.policies["login"]
+    assert limiter._local(policy, "a", 0.0) == 0.0
+    assert limiter._local(policy, "a", 0.0) > 0
+
+    limiter._local(policy, "b", 0.0)
+    limiter._local(policy, "c", 0.0)
+
+    assert limiter.stats()["tracked_keys"] == 2
+    assert limiter._local(policy, "a", 0.0) == 0.0
+
+
+async def test_hit_raises_and_counts(db):
+    limiter = RateLimiter([Policy.parse("login_ip", "2/60"), Policy.parse("login_email", "1/60")])
+
+    await limiter.hit(db, [("login_ip", "1.2.3.4"), ("login_email", "a@example.com")])
+    with pytest.raises(RateLimited) as error:
+        await limiter.hit(db, [("login_ip", "1.2.3.4"), ("login_email", "a@example.com")])
+
+    assert error.value.policy == "login_email"
+    assert error.value.retry_after == 60
+    stats = limiter.stats()["policies"]
+    assert (stats["login_ip"]["allowed"], stats["login_email"]["rejected"]) == (2, 1)
+
+
+async def test_missing_key_is_not_limited(db):
+    limiter = RateLimiter([Policy.parse("login_ip", "1/60")])
+
+    for _ in range(3):
+        await limiter.hit(db, [("login_ip", None)])
+
+
+@pytest.fixture
+def login_limits(monkeypatch):
+    limiter = RateLimiter([
+        Policy.parse("login_ip", "2/60"), Policy.parse("login_email", "100/60"),
+        Policy.parse("register_ip", "100/60"), Policy.parse("register_email", "100/60"),
+    ])
+    monkeypatch.setattr(server, "rate_limiter", limiter)
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    return limiter
+
+
+async def attempt_logins(api, count, spoof=False):
+    statuses = []
+    for index in range(count):
+        headers = {"X-Forwarded-For": f"203.0.113.{index}"} if spoof else {}
+        response = await api.post("/api/auth/login", json={"email": f"user{index}@example.com", "password": "x"}, headers=headers)
+        statuses.append(response.status_code)
+    return statuses, response
+
+
+async def test_login_is_limited_per_client_ip(db, api, login_limits):
+    statuses, last = await attempt_logins(api, 3)
+
+    assert statuses == [401, 401, 429]
+    assert last.headers['retry-after'] == "30"
+
+
+async def test_forwarded_for_does_not_reset_the_limit_by_default(db, api, login_limits):
+    statuses, _ = await attempt_logins(api, 3, spoof=True)
+
+    assert statuses == [401, 401, 429]
+
+
+async def test_forwarded_for_is_read_behind_trusted_proxies(db, api, login_limits, monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+
+    statuses, _ = await attempt_logins(api, 3, spoof=True)
+
+    assert statuses == [401, 401, 401]
+
+
+async def test_shared_buckets_hold_across_limiters(db):
+    # Two workers, each with its own in-process table
+    policies = [Policy.parse("login_ip", "2/60")]
+    first, second = RateLimiter(policies, shared=True), RateLimiter(policies, shared=True)
+
+    await first.hit(db, [("login_ip", "1.2.3.4")])
+    await second.hit(db, [("login_ip", "1.2.3.4")])
+    with pytest.raises(RateLimited):
+        await first.hit(db, [("login_ip", "1.2.3.4")])
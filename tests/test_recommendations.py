@@ -0,0 +1,76 @@
+import random
+from collections import Counter
+from itertools import permutations
+
+import pytest
+
+import recommendations
+from recommendations import CoOccurrence, PAIRS, RECOMMENDATIONS
+
+
+def naive_top(baskets, top_n):
+    counts = Counter(pair for basket in baskets for pair in permutations(basket, 2))
+    rows = {}
+    for (product_id, other), count in counts.items():
+        rows.setdefault(product_id, []).append((other, count))
+    return {
+        product_id: sorted(related, key=lambda item: (-item[1], item[0]))[:top_n]
+        for product_id, related in rows.items()
+    }
+
+
+def matrix_top(matrix, top_n):
+    rows, columns, counts = matrix.top(top_n)
+    result = {}
+    for row, column, count in zip(rows.tolist(), columns.tolist(), counts.tolist()):
+        result.setdefault(matrix.product_ids[row], []).append((matrix.product_ids[column], count))
+    return result
+
+
+@pytest.mark.parametrize("chunk_pairs", [1, 7, 1_000_000])
+@pytest.mark.parametrize("top_n", [1, 3, 50])
+def test_top_matches_naive_count(chunk_pairs, top_n):
+    rng = random.Random(chunk_pairs * 100 + top_n)
+    catalog = [f"product-{index:02d}" for index in range(25)]
+    baskets = [rng.sample(catalog, rng.randint(2, 6)) for _ in range(300)]
+
+    matrix = CoOccurrence(chunk_pairs)
+    for basket in baskets:
+        matrix.add(basket)
+
+    assert matrix_top(matrix, top_n) == naive_top(baskets, top_n)
+    assert len(matrix) == len({pair for basket in baskets for pair in permutations(basket, 2)})
+
+
+def test_ties_go_to_smaller_product_id():
+    matrix = CoOccurrence()
+    # Insertion order differs from name order
+    matrix.add(["c", "b", "a"])
+
+    assert matrix_top(matrix, 1) == {"a": [("b", 1)], "b": [("a", 1)], "c": [("a", 1)]}
+
+
+@pytest.mark.anyio
+async def test_rebuild_swaps_in_an_indexed_pairs_collection(db, monkeypatch):
+    await db.orders.insert_many([
+        {"id": "o1", "user_id": "u1", "idempotency_key": "k1", "items": [{"product_id": "a"}, {"product_id": "b"}]},
+        {"id": "o2", "user_id": "u1", "idempotency_key": "k2", "items": [{"product_id": "a"}, {"product_id": "c"}, {"product_id": "b"}]},
+    ])
+    await db[PAIRS].drop()
+    collection_type = type(db[PAIRS])
+    rename = collection_type.rename
+    indexed_at_swap = {}
+
+    async def checked_rename(collection, new_name, **kwargs):
+        indexed_at_swap[new_name] = set(await collection.index_information())
+        return await rename(collection, new_name, **kwargs)
+
+    monkeypatch.setattr(collection_type, "rename", checked_rename)
+    summary = await recommendations.rebuild(db)
+
+    assert summary == {"orders": 2, "products": 3, "pairs": 6}
+    assert {index.document["name"] for index in recommendations.INDEXES[PAIRS]} <= indexed_at_swap[PAIRS]
+    assert set(await db.list_collection_names()) >= {PAIRS, RECOMMENDATIONS}
+    assert not any(name.endswith("_rebuild") for name in await db.list_collection_names())
+    top = await db[RECOMMENDATIONS].find_one({"_id": "a"})
+    assert top["items"][0] == {"product_id": "b", "count": 2}
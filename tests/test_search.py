@@ -0,0 +1,76 @@
+import pytest
+
+import server
+from search_index import SearchIndex, stem, tokenize
+from tests.conftest import make_product
+
+PRODUCTS = [
+    {"id": "serum", "name": "Vitamin C Serum", "description": "Brightening serum for dull skin", "concern": "dull_skin"},
+    {"id": "cream", "name": "Night Cream", "description": "Rich cream with a drop of vitamin E", "concern": "aging"},
+    {"id": "oil", "name": "Argan Hair Oil", "description": "Nourishing oil for frizzy hair", "concern": "frizzy_hair"},
+]
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.build(PRODUCTS)
+    return index
+
+
+@pytest.mark.parametrize("words", [("serums", "serum"), ("brightening", "brighten"), ("hydrating", "hydrate")])
+def test_stem_folds_word_forms(words):
+    assert stem(words[0]) == stem(words[1])
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The Vitamin-C serum, for you!") == ["vitamin", "c", "serum"]
+
+
+def test_name_match_outranks_description_match(index):
+    ranked = [doc_id for doc_id, _ in index.search("vitamin")]
+
+    assert ranked == ["serum", "cream"]
+
+
+def test_every_query_term_contributes(index):
+    ranked = [doc_id for doc_id, _ in index.search("frizzy serum")]
+
+    assert set(ranked) == {"serum", "oil"}
+    assert index.matching("frizzy serum") == {"serum", "oil"}
+    assert index.search("the and of") == []
+
+
+def test_add_replaces_and_remove_forgets(index):
+    index.add({**PRODUCTS[0], "name": "Retinol Serum", "description": "Night serum"})
+    index.remove("oil")
+
+    assert [doc_id for doc_id, _ in index.search("vitamin")] == ["cream"]
+    assert index.search("argan") == []
+    assert "argan" not in index.postings
+    assert len(index) == 2
+    assert index.total_length == pytest.approx(sum(index.doc_lengths.values()))
+
+
+@pytest.fixture
+async def catalog(db):
+    await db.products.insert_many([
+        make_product(id=product['id'], name=product['name'], description=product['description'],
+                     concern=product['concern'], price=price)
+        for product, price in zip(PRODUCTS, (300, 100, 200))
+    ])
+    await server.bump_catalog_version()
+
+
+@pytest.mark.anyio
+async def test_search_route_ranks_by_relevance(api, catalog):
+    response = await api.get("/api/products", params={"search": "vitamin"})
+
+    assert [product['id'] for product in response.json()] == ["serum", "cream"]
+
+
+@pytest.mark.anyio
+async def test_sorted_search_orders_every_match(api, catalog):
+    response = await api.get("/api/products", params={"search": "vitamin hair", "sort": "price"})
+
+    assert [product['id'] for product in response.json()] == ["cream", "oil", "serum"]
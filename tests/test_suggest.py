@@ -0,0 +1,69 @@
+import pytest
+
+import server
+from suggest_index import SuggestIndex
+from tests.conftest import make_product
+
+PRODUCTS = [
+    {"id": "cream", "name": "Hyaluronic Acid Hydrating Cream", "ingredients": "Hyaluronic Acid, Ceramides",
+     "concern": "dry_skin", "rating": 4.6, "review_count": 120, "images": ["cream.jpg"]},
+    {"id": "serum", "name": "Hydrating Serum", "ingredients": "Glycerin", "concern": "dry_skin",
+     "rating": 4.8, "review_count": 40, "images": []},
+    {"id": "shampoo", "name": "Argan Shampoo", "ingredients": "Argan Oil", "concern": "frizzy_hair",
+     "rating": 4.6, "review_count": 300},
+]
+
+
+@pytest.fixture
+def index():
+    index = SuggestIndex()
+    index.build(PRODUCTS)
+    return index
+
+
+def ids(suggestions):
+    return [suggestion['id'] for suggestion in suggestions]
+
+
+def test_every_query_word_must_prefix_a_product_word(index):
+    assert ids(index.suggest("hyal cre")) == ["cream"]
+    assert ids(index.suggest("hydr")) == ["serum", "cream"]
+    assert index.suggest("hydr argan") == []
+    assert index.suggest("  ") == []
+
+
+def test_ranked_by_rating_then_reviews_and_limited(index):
+    assert ids(index.suggest("s")) == ["serum", "shampoo", "cream"]
+    assert ids(index.suggest("s", limit=1)) == ["serum"]
+
+
+def test_suggestions_are_summaries(index):
+    suggestion = index.suggest("cream")[0]
+
+    assert suggestion['image'] == "cream.jpg"
+    assert "description" not in suggestion and "ingredients" not in suggestion
+
+
+def test_add_and_remove_update_memoized_prefixes(index):
+    assert ids(index.suggest("ar")) == ["shampoo"]
+
+    index.add({"id": "mask", "name": "Argan Hair Mask", "rating": 5.0, "review_count": 1})
+    assert ids(index.suggest("ar")) == ["mask", "shampoo"]
+
+    index.remove("shampoo")
+    index.add({**PRODUCTS[1], "name": "Retinol Serum"})
+    assert ids(index.suggest("ar")) == ["mask"]
+    assert index.suggest("shamp") == []
+    assert ids(index.suggest("hydr")) == ["cream"]
+    assert index.words == sorted(index.postings)
+
+
+@pytest.mark.anyio
+async def test_suggest_route_follows_catalog_writes(api, db):
+    await db.products.insert_one(make_product(id="p1", name="Vitamin C Serum"))
+    await server.bump_catalog_version()
+    assert ids((await api.get("/api/products/suggest", params={"q": "vit"})).json()) == ["p1"]
+
+    await api.delete("/api/admin/products/p1")
+
+    assert (await api.get("/api/products/suggest", params={"q": "vit"})).json() == []